@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import math
+import os
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+
+import weatherrouting
+from weatherrouting.geodesy import GEODESY_BACKENDS, get_geodesy
+from weatherrouting.routers.linearbestisorouter import LinearBestIsoRouter
+
+from .mock_grib import MockGrib
+
+
+class TestGeodesy(unittest.TestCase):
+    @parameterized.expand([[name] for name in GEODESY_BACKENDS])
+    def test_many(self, name):
+        geodesy = get_geodesy(name)
+        lats = np.array([5.0, 5.2, -40.0])
+        lons = np.array([38.0, 179.9, -10.0])
+        dists = np.array([3.0, 20.0, 0.0])
+        hdgs = np.radians([10.0, 80.0, 200.0])
+
+        plats, plons = geodesy.routage_point_distance_many(lats, lons, dists, hdgs)
+        d = geodesy.point_distance_many(lats, lons, plats, plons)
+        los_d, los_brg = geodesy.lossodromic_many(5.0, 38.0, plats, plons)
+        for i in range(len(lats)):
+            p = geodesy.routage_point_distance(lats[i], lons[i], dists[i], hdgs[i])
+            self.assertAlmostEqual(plats[i], p[0], delta=1e-9)
+            self.assertAlmostEqual(plons[i], p[1], delta=1e-9)
+            self.assertAlmostEqual(d[i], dists[i], delta=1e-6)
+            self.assertAlmostEqual(
+                d[i], geodesy.point_distance(lats[i], lons[i], p[0], p[1]), delta=1e-9
+            )
+            los = geodesy.lossodromic(5.0, 38.0, p[0], p[1])
+            self.assertAlmostEqual(los_d[i], los[0], delta=1e-6)
+            self.assertAlmostEqual(los_brg[i], los[1], delta=1e-9)
+
+    @parameterized.expand([[name] for name in GEODESY_BACKENDS])
+    def test_short_hop(self, name):
+        geodesy = get_geodesy(name)
+        d = geodesy.point_distance(43.0, 10.0, 43.1, 10.1)
+        self.assertAlmostEqual(d, 7.5, delta=0.1)
+
+        brg = geodesy.lossodromic(43.0, 10.0, 43.0, 10.1)[1]
+        self.assertAlmostEqual(brg, math.pi / 2, delta=0.01)
+
+    def test_get_geodesy(self):
+        geodesy = weatherrouting.FlatGeodesy()
+        self.assertIs(get_geodesy(geodesy), geodesy)
+        with self.assertRaises(Exception):
+            get_geodesy("flatearth")
+
+    def test_router_param(self):
+        polar = weatherrouting.Polar(
+            os.path.join(os.path.dirname(__file__), "data/bavaria38.pol")
+        )
+        routers = []
+        for name in GEODESY_BACKENDS:
+            routing_obj = weatherrouting.Routing(
+                LinearBestIsoRouter,
+                polar,
+                [(5, 38), (5.2, 38.2)],
+                MockGrib(10, 270, 0.5),
+                datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+            )
+            routing_obj.algorithm.set_param_value("geodesy", name)
+            routers.append(routing_obj.algorithm)
+
+            while not routing_obj.end:
+                res = routing_obj.step()
+            self.assertEqual(not res.path, False)
+
+        for router, name in zip(routers, GEODESY_BACKENDS):
+            self.assertIs(router.get_geodesy(), GEODESY_BACKENDS[name])
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import os
+import unittest
+
+import numpy as np
+from parameterized import parameterized
+
+import weatherrouting
+from weatherrouting.routers.heuristicisorouter import HeuristicIsoRouter
+from weatherrouting.routers.linearbestisorouter import LinearBestIsoRouter
+from weatherrouting.routers.router import Isochrone, IsoPoint
+
+from .mock_grib import MockGrib
+
+polar_bavaria38 = weatherrouting.Polar(
+    os.path.join(os.path.dirname(__file__), "data/bavaria38.pol")
+)
+
+
+START = datetime.datetime.fromisoformat("2021-04-02T12:00:00")
+
+
+def run_routing(algorithm, track, grib, coarse=False, timedelta=1, **kwargs):
+    routing_obj = weatherrouting.Routing(
+        algorithm, polar_bavaria38, track, grib, START, **kwargs
+    )
+    if coarse:
+        routing_obj.run_coarse()
+    points = 0
+    while not routing_obj.end:
+        res = routing_obj.step(timedelta)
+        points += len(res.isochrones[-1])
+    return res, points
+
+
+# a barrier across the (5, 38) - (5, 39) track
+def point_validity(lat, lon):
+    return not (4.7 < lat < 5.3 and 38.45 < lon < 38.55)
+
+
+def line_validity(lat1, lon1, lat2, lon2):
+    return all(
+        point_validity(lat1 + (lat2 - lat1) * k, lon1 + (lon2 - lon1) * k)
+        for k in np.linspace(0, 1, 11)
+    )
+
+
+class TestHeuristicIsoRouter(unittest.TestCase):
+    def test_max_speed(self):
+        router = HeuristicIsoRouter(polar_bavaria38, MockGrib(10, 270, 0.5))
+        max_speed = router.get_max_speed()
+        self.assertAlmostEqual(max_speed, float(polar_bavaria38.speed_table.max()))
+
+    def test_forecast_max_speed(self):
+        router = HeuristicIsoRouter(polar_bavaria38, MockGrib(10, 270, 0.5))
+        tws = [float(w) for w in polar_bavaria38.tws]
+        self.assertEqual(
+            router.get_tws_max_speed(tws[0], tws[-1]), router.get_max_speed()
+        )
+        self.assertEqual(
+            router.get_tws_max_speed(14.0, 18.0),
+            max(polar_bavaria38.get_reaching(w)[0] for w in (14.0, 16.0, 18.0)),
+        )
+
+        # the mock wind is between 7.5 and 12.5 m/s
+        vmax = router.get_forecast_max_speed([START], [5, 6], [38, 39])
+        self.assertLessEqual(vmax, router.get_tws_max_speed(14.5, 24.4))
+        self.assertLess(vmax, router.get_max_speed())
+        self.assertIsNone(
+            HeuristicIsoRouter(
+                polar_bavaria38, MockGrib(10, 270, 0.5, out_of_scope=START)
+            ).get_forecast_max_speed([START], [5, 6], [38, 39])
+        )
+
+    def test_prune(self):
+        router = HeuristicIsoRouter(polar_bavaria38, MockGrib(10, 270, 0))
+        tws = 10 * weatherrouting.utils.MS2KT
+        vmax = router.get_tws_max_speed(tws, tws)
+        history = [Isochrone(time=START - datetime.timedelta(hours=1), lat=[0.0])]
+        iso = Isochrone(
+            time=START,
+            lat=[1.0, 2.0, 3.0, 4.0],
+            tws=[tws] * 4,
+            next_wp_dist=np.array([1.0, 2.5, 1.5, 2.0]) * vmax,
+        )
+        self.assertIs(router._prune(iso, (0, 0), history), iso)
+
+        # the incumbent reaches (0, 0.2) about one hour after START, sailing the
+        # last 6 nm; its point on (0, 0.2) is of an earlier leg
+        router.set_incumbent(
+            [
+                IsoPoint((0, 0.2), time=START - datetime.timedelta(hours=2)),
+                IsoPoint((0, 0), time=START),
+                IsoPoint((0, 0.1), time=START, speed=6.0),
+            ]
+        )
+        self.assertEqual(router.get_incumbent_arrival((0, 0)), START)
+        self.assertEqual(
+            router.get_incumbent_arrival((0, 0.2)),
+            START - datetime.timedelta(hours=2),
+        )
+        self.assertAlmostEqual(
+            router.get_incumbent_arrival((0, 0.2), history[0].time),
+            START + datetime.timedelta(hours=1),
+            delta=datetime.timedelta(seconds=5),
+        )
+        self.assertIsNone(
+            router.get_incumbent_arrival((0, 0.2), START + datetime.timedelta(hours=1))
+        )
+        self.assertEqual(
+            router._prune(iso, (0, 0.2), history).lat.tolist(), [1.0, 3.0, 4.0]
+        )
+
+        router.set_param_value("incumbent_margin", 0.0)
+        self.assertEqual(router._prune(iso, (0, 0.2), history).lat.tolist(), [1.0])
+        # the incumbent never empties an isochrone
+        self.assertEqual(len(router._prune(iso, (0, 0), history)), 4)
+
+        router.set_incumbent(None)
+        self.assertIs(router._prune(iso, (0, 0.2), history), iso)
+
+    @parameterized.expand(
+        [
+            [(10, 270, 0.5), [(5, 38), (6, 39)]],
+            [(5, 45, 0.5), [(5, 38), (6, 39)]],
+            [(3, 180, 0.9), [(5, 38), (6, 39)]],
+            [(10, 270, 0.5), [(5, 38), (5.5, 39), (6.5, 39.2)]],
+        ]
+    )
+    def test_same_arrival(self, wind, track):
+        res, points = run_routing(LinearBestIsoRouter, track, MockGrib(*wind))
+        heuristic_res, heuristic_points = run_routing(
+            HeuristicIsoRouter, track, MockGrib(*wind), coarse=True
+        )
+
+        self.assertEqual(heuristic_res.path[-1].time, res.path[-1].time)
+        self.assertLess(heuristic_points, points)
+
+    def test_auto_incumbent(self):
+        track = [(5, 38), (6, 39)]
+        res, points = run_routing(LinearBestIsoRouter, track, MockGrib(10, 270, 0.5))
+        routing_obj = weatherrouting.Routing(
+            HeuristicIsoRouter, polar_bavaria38, track, MockGrib(10, 270, 0.5), START
+        )
+        heuristic_points = 0
+        while not routing_obj.end:
+            heuristic_res = routing_obj.step(1)
+            heuristic_points += len(heuristic_res.isochrones[-1])
+
+        self.assertEqual(
+            routing_obj.algorithm.incumbent, routing_obj.coarse_result.path
+        )
+        # no corridor without corridor_width
+        self.assertEqual(routing_obj.algorithm.get_param_value("corridor_width"), 0)
+        self.assertEqual(heuristic_res.path[-1].time, res.path[-1].time)
+        self.assertLess(heuristic_points, points)
+
+    def test_barrier(self):
+        track = [(5, 38), (5, 39)]
+        kwargs = {
+            "timedelta": 0.5,
+            "point_validity": point_validity,
+            "line_validity": line_validity,
+        }
+        res, points = run_routing(
+            LinearBestIsoRouter, track, MockGrib(5, 0, 0.1), **kwargs
+        )
+        heuristic_res, heuristic_points = run_routing(
+            HeuristicIsoRouter, track, MockGrib(5, 0, 0.1), coarse=True, **kwargs
+        )
+
+        self.assertEqual(heuristic_res.path[-1].time, res.path[-1].time)
+        self.assertTrue(all(len(iso) > 0 for iso in heuristic_res.isochrones))
+        self.assertLess(heuristic_points, points)
+
+    def test_listed(self):
+        self.assertIn(
+            HeuristicIsoRouter,
+            [a["class"] for a in weatherrouting.list_routing_algorithms()],
+        )
@@ -253,6 +253,7 @@ class CheckRouteMultipoint(unittest.TestCase):
             grib,
             datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
         )
+        self.routing_obj.algorithm.set_param_value("geodesy", "ellipsoidal")
 
     def test_step(self):
         res = None
@@ -288,5 +289,25 @@ class TestRoutingCustomStep(unittest.TestCase):
             res = self.routing_obj.step(timedelta=0.5)
             i += 1
 
-        self.assertEqual(i, 12)
+        self.assertEqual(i, 13)
         self.assertEqual(not res.path, False)
+
+
+class TestRoutingLongStep(unittest.TestCase):
+    @parameterized.expand([[1], [3], [6]])
+    def test_arrival(self, timedelta):
+        track = [(5, 38), (6, 38.5)]
+        routing_obj = weatherrouting.Routing(
+            LinearBestIsoRouter,
+            polar_bavaria38,
+            track,
+            MockGrib(10, 270, 0.5),
+            datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+        )
+        while not routing_obj.end:
+            routing_obj.step(timedelta=timedelta)
+
+        # long steps arrive within an hour of the waypoint, as the 1 hour steps
+        last = routing_obj.path[-1]
+        distance = weatherrouting.utils.point_distance(*last.pos, *track[-1])
+        self.assertLess(distance, last.speed * 1.1)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import os
+import unittest
+from unittest import mock
+
+import weatherrouting
+from weatherrouting.routers.meshrouter import Mesh, MeshRouter
+
+from .mock_grib import MockGrib
+
+polar_bavaria38 = weatherrouting.Polar(
+    os.path.join(os.path.dirname(__file__), "data/bavaria38.pol")
+)
+
+
+class Island:
+    """A square island around (38.35, 5.35), counting the validity calls"""
+
+    def __init__(self, size=0.1):
+        self.size = size
+        self.calls = 0
+
+    def point_validity(self, lat, lon):
+        self.calls += 1
+        return abs(lat - 38.35) > self.size or abs(lon - 5.35) > self.size
+
+    def line_validity(self, lat1, lon1, lat2, lon2):
+        self.calls += 1
+        return all(
+            self.point_validity(
+                lat1 + (lat2 - lat1) * k / 4, lon1 + (lon2 - lon1) * k / 4
+            )
+            for k in range(5)
+        )
+
+
+def run_routing(track, **kwargs):
+    routing_obj = weatherrouting.Routing(
+        MeshRouter,
+        polar_bavaria38,
+        track,
+        MockGrib(10, 270, 0.5),
+        datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+        **kwargs,
+    )
+    while not routing_obj.end:
+        res = routing_obj.step()
+    return routing_obj, res
+
+
+class TestMesh(unittest.TestCase):
+    def test_build(self):
+        mesh = Mesh((38.0, 5.0, 38.5, 5.5), 0.1)
+        self.assertEqual(len(mesh), 36)
+        self.assertEqual(mesh.offsets[-1], len(mesh.dst))
+        # corner nodes have 4 neighbours: 2 sides, 1 diagonal and 2 knight moves
+        self.assertEqual(mesh.offsets[1] - mesh.offsets[0], 5)
+        self.assertTrue(mesh.contains(38.25, 5.5))
+        self.assertFalse(mesh.contains(38.25, 5.6))
+
+    def test_validity(self):
+        island = Island()
+        mesh = Mesh(
+            (38.0, 5.0, 38.7, 5.7),
+            0.1,
+            point_validity=island.point_validity,
+            line_validity=island.line_validity,
+        )
+        src = [i for i in range(len(mesh)) for _ in range(*mesh.offsets[i : i + 2])]
+        for a, b in zip(src, mesh.dst):
+            self.assertTrue(
+                island.line_validity(mesh.lat[a], mesh.lon[a], mesh.lat[b], mesh.lon[b])
+            )
+        self.assertEqual(int(mesh.valid.sum()), 64 - 4)
+
+
+class TestMeshRouter(unittest.TestCase):
+    def test_route(self):
+        track = [(38.0, 5.0), (38.7, 5.7)]
+        island = Island()
+        routing_obj, res = run_routing(
+            track,
+            point_validity=island.point_validity,
+            line_validity=island.line_validity,
+        )
+
+        times = [p.time for p in res.path]
+        self.assertEqual(times, sorted(times))
+        self.assertEqual(res.path[0].pos, track[0])
+        self.assertEqual(res.path[-1].pos, track[1])
+        for a, b in zip(res.path[:-1], res.path[1:]):
+            self.assertTrue(island.line_validity(*a.pos, *b.pos))
+        self.assertEqual(routing_obj.get_current_best_path(), res.path)
+
+    def test_mesh_reuse(self):
+        track = [(38.0, 5.0), (38.7, 5.7)]
+        island = Island()
+        routing_obj, _ = run_routing(
+            track,
+            point_validity=island.point_validity,
+            line_validity=island.line_validity,
+        )
+        calls = island.calls
+
+        routing_obj, _ = run_routing(
+            [(38.7, 5.7), (38.0, 5.0)],
+            point_validity=island.point_validity,
+            line_validity=island.line_validity,
+        )
+        # only the links of the start and of the end are validated again
+        self.assertLess(island.calls - calls, calls / 10)
+
+    def test_wider_mesh_reuse(self):
+        island = Island()
+        routing_obj, _ = run_routing(
+            [(38.0, 5.0), (38.7, 5.7)],
+            point_validity=island.point_validity,
+            line_validity=island.line_validity,
+        )
+        calls = island.calls
+        mesh = routing_obj.algorithm.get_mesh((38.0, 5.0), (38.7, 5.7))
+
+        # a track inside the area of the cached mesh
+        track = [(38.1, 5.1), (38.6, 5.6)]
+        routing_obj, res = run_routing(
+            track,
+            point_validity=island.point_validity,
+            line_validity=island.line_validity,
+        )
+        self.assertIs(routing_obj.algorithm.get_mesh(*track), mesh)
+        self.assertEqual(res.path[-1].pos, track[1])
+        self.assertLess(island.calls - calls, calls / 10)
+
+    def test_no_path(self):
+        island = Island(size=0.3)
+        with self.assertRaises(weatherrouting.RoutingNoPathError):
+            run_routing(
+                [(38.0, 5.0), (38.35, 5.35)],
+                point_validity=island.point_validity,
+                line_validity=island.line_validity,
+            )
+
+    def test_no_wind(self):
+        grib = MockGrib(10, 270, 0.5)
+        with mock.patch.object(grib, "get_wind_at", side_effect=KeyError("no data")):
+            routing_obj = weatherrouting.Routing(
+                MeshRouter,
+                polar_bavaria38,
+                [(38.0, 5.0), (38.2, 5.2)],
+                grib,
+                datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+            )
+            with self.assertRaises(weatherrouting.RoutingNoWindError):
+                routing_obj.step()
+
+    def test_listed(self):
+        self.assertIn(
+            MeshRouter, [a["class"] for a in weatherrouting.list_routing_algorithms()]
+        )
@@ -18,6 +18,9 @@ import os
 import tempfile
 import unittest
 
+import numpy as np
+from parameterized import parameterized
+
 import weatherrouting
 
 
@@ -63,6 +66,55 @@ class TestPolar(unittest.TestCase):
             self.polar_obj.get_speed(2.2, math.radians(170)), 1.1, delta=0.001
         )
 
+    def test_get_speed_array(self):
+        tws = np.array([8, 8.3, 8.3, 2.2, 70])
+        twa = np.radians([60, 60, 64, 170, 90])
+        speeds = self.polar_obj.get_speed(tws, twa)
+        self.assertEqual(speeds.shape, (5,))
+        for i in range(len(tws)):
+            self.assertAlmostEqual(
+                speeds[i],
+                self.polar_obj.get_speed(float(tws[i]), float(twa[i])),
+                delta=1e-9,
+            )
+
+        sweep = self.polar_obj.get_speed(8.3, np.radians(np.arange(0, 181, 5)))
+        self.assertEqual(sweep.shape, (37,))
+        self.assertAlmostEqual(sweep[12], 6.205, delta=0.001)
+
+    def test_gridded(self):
+        gridded = weatherrouting.Polar(self.valid_file_path, gridded=True)
+        info = gridded.grid_info
+        self.assertEqual(info["tws_step"], 0.1)
+        self.assertEqual(info["twa_step"], 0.5)
+        self.assertEqual(info["shape"], (601, 361))
+
+        tws = np.linspace(0, 65, 97)
+        twa = np.radians(np.linspace(0, 180, 89))
+        tws, twa = np.meshgrid(tws, twa)
+        err = np.abs(gridded.get_speed(tws, twa) - self.polar_obj.get_speed(tws, twa))
+        self.assertLessEqual(float(np.max(err)), info["max_error"] + 1e-6)
+
+        self.assertAlmostEqual(
+            gridded.get_speed(8.3, math.radians(64)), 6.279, delta=0.001
+        )
+
+    def test_gridded_error_bound(self):
+        gridded = weatherrouting.Polar(
+            self.valid_file_path, gridded=True, grid_max_error=0.1
+        )
+        self.assertLessEqual(gridded.grid_info["max_error"], 0.1)
+        self.assertEqual(gridded.grid_info["tws_step"], 0.05)
+
+        with self.assertRaisesRegex(weatherrouting.PolarError, "GRID_ERROR_BOUND"):
+            weatherrouting.Polar(
+                self.valid_file_path,
+                gridded=True,
+                grid_max_error=0.0,
+                grid_tws_step=1.0,
+                grid_twa_step=5.0,
+            )
+
     def test_routage(self):
         self.assertAlmostEqual(
             self.polar_obj.get_routage_speed(2.2, math.radians(170)),
@@ -75,6 +127,16 @@ class TestPolar(unittest.TestCase):
             delta=0.001,
         )
 
+    def test_vmg_cache(self):
+        polar = weatherrouting.Polar(self.valid_file_path, vmg_cache_size=8)
+        up = polar.get_max_vmg_up(8.0)
+        self.assertEqual(polar.get_max_vmg_up(8.004), up)
+        self.assertEqual(len(polar.vmgdict), 1)
+
+        for i in range(20):
+            polar.get_max_vmg_down(i)
+        self.assertEqual(len(polar.vmgdict), 8)
+
     def test_reaching(self):
         self.assertAlmostEqual(
             self.polar_obj.get_reaching(6.1)[0], 5.3549999999999995, delta=0.001
@@ -83,6 +145,31 @@ class TestPolar(unittest.TestCase):
             self.polar_obj.get_reaching(6.1)[1], 1.3962634015954636, delta=0.001
         )
 
+    @parameterized.expand([["bavaria38.npz"], ["bavaria38"], ["bavaria38.pol.bin"]])
+    def test_compiled(self, filename):
+        compiled_path = os.path.join(tempfile.mkdtemp(), filename)
+        self.addCleanup(os.remove, compiled_path)
+        self.polar_obj.save_compiled(compiled_path)
+
+        polar = weatherrouting.Polar.load_compiled(compiled_path)
+        self.assertEqual(polar.to_string(), self.polar_obj.to_string())
+        self.assertAlmostEqual(
+            polar.get_speed(8.3, math.radians(64)), 6.279, delta=0.001
+        )
+
+        gridded = weatherrouting.Polar.load_compiled(compiled_path, gridded=True)
+        self.assertIsNotNone(gridded.grid_info)
+
+    def test_compiled_invalid(self):
+        temp_file_path = create_temp_file("not a compiled polar", self)
+        with self.assertRaisesRegex(weatherrouting.PolarError, "INVALID_COMPILED_FILE"):
+            weatherrouting.Polar.load_compiled(temp_file_path)
+
+    def test_open_file(self):
+        with open(self.valid_file_path, "r") as f:
+            polar = weatherrouting.Polar(None, f)
+        self.assertEqual(polar.to_string(), self.polar_obj.to_string())
+
     # --- Tests for Polar.validate_file ---
     def test_validate_valid_file(self):
         # This should not raise an error for a known valid file
@@ -126,6 +213,12 @@ class TestPolar(unittest.TestCase):
         with self.assertRaisesRegex(weatherrouting.PolarError, "EMPTY_LINE"):
             weatherrouting.Polar.validate_file(temp_file_path)
 
+    def test_validate_trailing_empty_lines(self):
+        with open(self.valid_file_path, "r", encoding="utf-8") as f:
+            valid_content = f.read()
+        temp_file_path = create_temp_file("\n" + valid_content + "\n\n", self)
+        self.assertTrue(weatherrouting.Polar.validate_file(temp_file_path))
+
     def test_validate_column_count_mismatch(self):
         with open(self.valid_file_path, "r", encoding="utf-8") as f:
             valid_content = f.read()
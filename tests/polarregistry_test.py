@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import tempfile
+import unittest
+
+import weatherrouting
+
+
+class TestPolarRegistry(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        polar_path = os.path.join(os.path.dirname(__file__), "data/bavaria38.pol")
+        with open(polar_path, "r") as f:
+            content = f.read()
+
+        for name, data in [
+            ("bavaria38", content),
+            ("bavaria38_copy", content),
+            ("bavaria38_fast", content.replace("7.7", "7.9")),
+            ("broken", "TWA\\TWS\ta\n"),
+        ]:
+            with open(os.path.join(self.directory, name + ".pol"), "w") as f:
+                f.write(data)
+        with open(os.path.join(self.directory, "notes.txt"), "w") as f:
+            f.write("not a polar")
+
+        self.registry = weatherrouting.PolarRegistry(self.directory, max_size=2)
+
+    def test_index(self):
+        self.assertEqual(
+            self.registry.names(),
+            ["bavaria38", "bavaria38_copy", "bavaria38_fast", "broken"],
+        )
+        self.assertIn("broken", self.registry)
+        self.assertNotIn("notes", self.registry)
+
+    def test_get(self):
+        polar = self.registry.get("bavaria38")
+        self.assertIs(self.registry.get("bavaria38"), polar)
+        self.assertIs(self.registry.get("bavaria38_copy"), polar)
+        self.assertIsNot(self.registry.get("bavaria38_fast"), polar)
+        self.assertFalse(polar.speed_table.flags.writeable)
+
+    def test_get_invalid(self):
+        with self.assertRaisesRegex(
+            weatherrouting.PolarError, "WIND_SPEED_NOT_NUMERIC"
+        ):
+            self.registry.get("broken")
+        with self.assertRaisesRegex(weatherrouting.PolarError, "POLAR_NOT_FOUND"):
+            self.registry.get("missing")
+
+    def test_max_size(self):
+        polar = self.registry.get("bavaria38")
+        self.registry.get("bavaria38_fast")
+        self.registry.get("bavaria38_fast")
+        self.assertIs(self.registry.get("bavaria38"), polar)
+
+        registry = weatherrouting.PolarRegistry(self.directory, max_size=1)
+        polar = registry.get("bavaria38")
+        registry.get("bavaria38_fast")
+        self.assertIsNot(registry.get("bavaria38"), polar)
@@ -0,0 +1,586 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import math
+import os
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+from parameterized import parameterized
+
+import weatherrouting
+from weatherrouting.routers.linearbestisorouter import LinearBestIsoRouter
+from weatherrouting.routers.router import (
+    HeadingSampler,
+    Isochrone,
+    IsoPoint,
+    PolarPointFunction,
+    Router,
+    corridor_distance,
+    early_rejection_mask,
+    predict_wp_dist,
+)
+from weatherrouting.routers.shortestpathrouter import ShortestPathRouter
+
+from .mock_grib import MockGrib
+from .mock_point_validity import MockpointValidity
+
+polar_bavaria38 = weatherrouting.Polar(
+    os.path.join(os.path.dirname(__file__), "data/bavaria38.pol")
+)
+
+
+def run_routing(algorithm, track, grib, params={}, **kwargs):
+    routing_obj = weatherrouting.Routing(
+        algorithm,
+        polar_bavaria38,
+        track,
+        grib,
+        datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+        **kwargs,
+    )
+    for code, value in params.items():
+        routing_obj.algorithm.set_param_value(code, value)
+
+    res = None
+    steps = 0
+    while not routing_obj.end:
+        res = routing_obj.step()
+        steps += 1
+    return steps, res
+
+
+class TestIsochrone(unittest.TestCase):
+    def setUp(self):
+        self.time = datetime.datetime.fromisoformat("2021-04-02T12:00:00")
+        self.points = [
+            IsoPoint((5.0, 38.0), 0, self.time, 1.0, 10.0, 6.0, 45.0, 12.0, (1.0, 0.5)),
+            IsoPoint((5.1, 38.1), 0, self.time, 1.1, 11.0, 6.5, 50.0, 11.0, (2.0, 0.6)),
+            IsoPoint((5.2, 38.2), 1, self.time, 1.2, 12.0, 7.0, 55.0, 10.0, (3.0, 0.7)),
+        ]
+        self.iso = Isochrone.from_points(self.points)
+
+    def test_view(self):
+        self.assertEqual(len(self.iso), 3)
+        self.assertEqual(self.iso.time, self.time)
+        self.assertEqual(self.iso[1], self.points[1])
+        self.assertEqual(self.iso[-1], self.points[-1])
+        self.assertEqual(self.iso.to_points(), self.points)
+        self.assertEqual(self.iso.prev_idx.tolist(), [0, 0, 1])
+        self.assertEqual(self.iso.positions().shape, (3, 2))
+
+    def test_take(self):
+        iso = self.iso.take(np.array([2, 0]))
+        self.assertEqual(iso.to_points(), [self.points[2], self.points[0]])
+
+        iso = self.iso.take(self.iso.next_wp_dist < 11.5)
+        self.assertEqual(iso.to_points(), self.points[1:])
+
+    def test_nearest_index(self):
+        self.assertEqual(self.iso.nearest_index(), 2)
+        self.assertEqual(self.iso.take([1, 0]).nearest_index(), 0)
+
+    def test_empty(self):
+        iso = Isochrone.from_points([])
+        self.assertEqual(len(iso), 0)
+        self.assertEqual(iso.to_points(), [])
+
+
+class TestVectorized(unittest.TestCase):
+    @parameterized.expand(
+        [
+            [LinearBestIsoRouter, (10, 270, 0.5), [(5, 38), (5.5, 38.5)]],
+            [LinearBestIsoRouter, (5, 45, 0.5), [(5, 38), (4.6, 37.6)]],
+            [ShortestPathRouter, (2, 180, 0.1), [(5, 38), (5.2, 38.2)]],
+        ]
+    )
+    def test_same_results(self, algorithm, wind, track):
+        island_route = MockpointValidity(track, factor=3)
+        scalar_steps, scalar_res = run_routing(
+            algorithm,
+            track,
+            MockGrib(*wind),
+            line_validity=island_route.line_validity,
+        )
+        steps, res = run_routing(
+            algorithm,
+            track,
+            MockGrib(*wind),
+            {"vectorized": True},
+            line_validity=island_route.line_validity,
+        )
+
+        self.assertEqual(steps, scalar_steps)
+        self.assertEqual(len(res.path), len(scalar_res.path))
+        for p, scalar_p in zip(res.path, scalar_res.path):
+            self.assertEqual(p.time, scalar_p.time)
+            self.assertAlmostEqual(p.pos[0], scalar_p.pos[0], delta=1e-9)
+            self.assertAlmostEqual(p.pos[1], scalar_p.pos[1], delta=1e-9)
+            self.assertAlmostEqual(p.speed, scalar_p.speed, delta=1e-9)
+            self.assertAlmostEqual(p.brg, scalar_p.brg, delta=1e-9)
+
+    @parameterized.expand(
+        [
+            [{}],
+            [{"vectorized": True}],
+            [{"vectorized": True, "adaptive_headings": True}],
+            [{"adaptive_headings": True}],
+        ]
+    )
+    def test_empty_isochrone(self, params):
+        router = LinearBestIsoRouter(polar_bavaria38, MockGrib(10, 270, 0.5))
+        for code, value in params.items():
+            router.set_param_value(code, value)
+        t = datetime.datetime.fromisoformat("2021-04-02T12:00:00")
+        start = Isochrone.from_points([IsoPoint((5, 38), time=t, next_wp_dist=20.0)])
+
+        isocrone = router.calculate_isochrones(
+            t, 1, [start, Isochrone(time=t)], (5.3, 38)
+        )
+
+        self.assertEqual(len(isocrone), 3)
+        self.assertEqual(len(isocrone[-1]), 0)
+
+    def test_reduce360_many(self):
+        alfas = [float("nan"), -7.0, -1.0, 0.0, 1.0, 2 * math.pi, 7.0, 20.0]
+        self.assertEqual(
+            weatherrouting.utils.reduce360_many(alfas).tolist(),
+            [weatherrouting.utils.reduce360(a) for a in alfas],
+        )
+
+
+class TestConcurrent(unittest.TestCase):
+    @parameterized.expand(
+        [
+            [LinearBestIsoRouter, "thread"],
+            [LinearBestIsoRouter, "process"],
+            [ShortestPathRouter, "process"],
+        ]
+    )
+    def test_same_results(self, algorithm, mode):
+        track = [(5, 38), (5.3, 38.3)]
+        _, serial_res = run_routing(algorithm, track, MockGrib(10, 270, 0.5))
+        _, res = run_routing(
+            algorithm,
+            track,
+            MockGrib(10, 270, 0.5),
+            {"concurrent": True, "concurrent_mode": mode},
+        )
+
+        self.assertEqual(
+            [p.to_list() for p in res.path], [p.to_list() for p in serial_res.path]
+        )
+        self.assertEqual(
+            res.isochrones[-1].positions().tolist(),
+            serial_res.isochrones[-1].positions().tolist(),
+        )
+
+
+class TestExecutor(unittest.TestCase):
+    def test_shared_executor(self):
+        track = [(5, 38), (5.3, 38.3)]
+        with ThreadPoolExecutor(2) as executor:
+            calls = []
+            executor_map = executor.map
+            executor.map = lambda *args: calls.append(args) or executor_map(*args)
+
+            _, res = run_routing(
+                LinearBestIsoRouter,
+                track,
+                MockGrib(10, 270, 0.5),
+                {"concurrent": True},
+                executor=executor,
+            )
+            # the shared executor is still usable after the routing
+            self.assertEqual(list(executor.map(abs, [-1])), [1])
+
+        self.assertGreater(len(calls), 0)
+        self.assertGreater(len(res.path), 0)
+
+    def test_owned_executor(self):
+        router = LinearBestIsoRouter(polar_bavaria38, MockGrib(10, 270, 0.5))
+        router.set_param_value("concurrent", True)
+        with router:
+            executor = router.get_executor()
+            self.assertIs(router.get_executor(), executor)
+        self.assertIsNone(router._owned_executor)
+
+        router.set_param_value("concurrent_mode", "process")
+        self.assertIsNot(router.get_executor(), executor)
+        router.close()
+
+    @parameterized.expand([[False], [True]])
+    def test_process_context(self, adaptive_headings):
+        track = [(5, 38), (5.3, 38.3)]
+        grib = MockGrib(10, 270, 0.5)
+        pools = []
+        chunks = []
+        process_map = ProcessPoolExecutor.map
+
+        def recording_map(executor, fn, iterable):
+            batch = list(iterable)
+            pools.append(executor)
+            chunks.extend(batch)
+            return process_map(executor, fn, batch)
+
+        with mock.patch.object(ProcessPoolExecutor, "map", recording_map):
+            _, res = run_routing(
+                LinearBestIsoRouter,
+                track,
+                grib,
+                {
+                    "concurrent": True,
+                    "concurrent_mode": "process",
+                    "adaptive_headings": adaptive_headings,
+                },
+            )
+
+        # a single pool, receiving neither the grib nor the polar with the chunks
+        self.assertGreater(len(res.path), 0)
+        self.assertEqual(len(set(map(id, pools))), 1)
+        for chunk in chunks:
+            for arg in chunk:
+                self.assertNotIsInstance(
+                    arg,
+                    (
+                        MockGrib,
+                        weatherrouting.Polar,
+                        PolarPointFunction,
+                        HeadingSampler,
+                    ),
+                )
+
+    def test_process_context_change(self):
+        router = LinearBestIsoRouter(polar_bavaria38, MockGrib(10, 270, 0.5))
+        router.set_param_value("concurrent_mode", "process")
+        geodesy = router.get_geodesy()
+        with router:
+            executor = router.get_executor(PolarPointFunction(polar_bavaria38, geodesy))
+            self.assertIs(
+                router.get_executor(PolarPointFunction(polar_bavaria38, geodesy)),
+                executor,
+            )
+            router.grib = MockGrib(5, 270, 0.5)
+            self.assertIsNot(
+                router.get_executor(PolarPointFunction(polar_bavaria38, geodesy)),
+                executor,
+            )
+
+
+class TestHeadingSampler(unittest.TestCase):
+    @parameterized.expand([[8, 0.0], [24, 1.0], [24, 4.0], [72, 2.5]])
+    def test_sample(self, budget, twd):
+        geodesy = weatherrouting.SphericalGeodesy()
+        sampler = HeadingSampler(budget, geodesy, polar_bavaria38)
+        twa = sampler((38, 5), twd, 12.0, (38.5, 5.5))
+
+        twa_wp = geodesy.lossodromic(38, 5, 38.5, 5.5)[1] - twd
+        off = np.abs((twa - twa_wp + math.pi) % (2 * math.pi) - math.pi)
+        self.assertEqual(len(twa), budget)
+        self.assertTrue(np.all((twa >= -math.pi) & (twa < math.pi)))
+        self.assertTrue(np.all(off <= math.pi / 2 + 1e-9))
+        self.assertAlmostEqual(float(np.min(off)), 0.0)
+
+    @parameterized.expand(
+        [
+            [LinearBestIsoRouter, (10, 270, 0.5)],
+            [LinearBestIsoRouter, (5, 45, 0.5)],
+            [ShortestPathRouter, (8, 180, 0.3)],
+        ]
+    )
+    def test_routing(self, algorithm, wind):
+        track = [(5, 38), (5.6, 38.7)]
+        steps, res = run_routing(algorithm, track, MockGrib(*wind))
+        for params in [{}, {"vectorized": True}]:
+            params["adaptive_headings"] = True
+            adaptive_steps, adaptive_res = run_routing(
+                algorithm, track, MockGrib(*wind), params
+            )
+            self.assertEqual(adaptive_steps, steps)
+            self.assertEqual(adaptive_res.path[-1].time, res.path[-1].time)
+
+
+class TestEarlyRejection(unittest.TestCase):
+    def test_predict_wp_dist(self):
+        geodesy = weatherrouting.SphericalGeodesy()
+        wp_brg = geodesy.lossodromic(38, 5, 38.5, 5.5)[1]
+        d = geodesy.point_distance(38, 5, 38.5, 5.5)
+        brg = np.radians(np.arange(0, 360, 15))
+        lat, lon = geodesy.routage_point_distance_many(38, 5, 6.0, brg)
+        expected = geodesy.point_distance_many(lat, lon, 38.5, 5.5)
+
+        np.testing.assert_allclose(
+            predict_wp_dist(d, 6.0, brg - wp_brg), expected, rtol=1e-3
+        )
+
+    def test_mask(self):
+        off = np.radians([0.0, 60.0, 89.0, 120.0, 180.0])
+        self.assertEqual(
+            early_rejection_mask(30.0, 6.0, off).tolist(),
+            [False, False, False, True, True],
+        )
+
+
+class TestPruning(unittest.TestCase):
+    def test_prune_sectors(self):
+        iso = Isochrone(
+            lat=np.arange(6.0),
+            lon=np.zeros(6),
+            los_brg=np.radians([10.2, -0.5, 0.5, 10.8, 3.0, 10.5]),
+            next_wp_dist=[5.0, 4.0, 4.0, 3.0, 2.0, 3.0],
+        )
+        self.assertEqual(Router._prune_sectors(iso, 1).lat.tolist(), [1.0, 4.0, 5.0])
+        self.assertEqual(Router._prune_sectors(iso, 5).lat.tolist(), [4.0, 5.0])
+        self.assertEqual(len(Router._prune_sectors(iso.take([]), 1)), 0)
+
+    def test_dedup(self):
+        iso = Isochrone(
+            lat=[38.0, 38.0001, 38.5, 38.0002],
+            lon=[5.0, 5.0001, 5.0, 5.3],
+            next_wp_dist=[3.0, 2.0, 1.0, 2.0],
+        )
+        self.assertEqual(Router._dedup(iso, 0.1).next_wp_dist.tolist(), [2.0, 1.0, 2.0])
+        self.assertEqual(len(Router._dedup(iso, 0.001)), 4)
+        self.assertEqual(len(Router._dedup(iso, 60.0)), 2)
+
+    def test_downsample(self):
+        iso = Isochrone(
+            lat=np.arange(8.0),
+            los_brg=np.radians([0.0, 1.0, 2.0, 3.0, 40.0, 41.0, 42.0, 90.0]),
+            next_wp_dist=[9.0, 5.0, 1.0, 2.0, 8.0, 7.0, 6.0, 9.5],
+        )
+        res = Router._downsample(iso, 5)
+        self.assertEqual(res.lat.tolist(), [1.0, 2.0, 3.0, 6.0, 7.0])
+        self.assertEqual(res.dropped, 3)
+        self.assertIs(Router._downsample(iso, 8), iso)
+
+    def test_envelope_mask(self):
+        brg = np.radians([-20.0, -10.0, 0.0, 10.0, 20.0])
+        iso = Isochrone(
+            lat=np.zeros(5),
+            los_brg=brg,
+            los_dist=np.array([10.0, 10.0, 8.0, 10.0, 10.0]) / np.cos(brg),
+        )
+        self.assertEqual(
+            Router._envelope_mask(iso).tolist(), [True, True, False, True, True]
+        )
+
+    def run_pipeline(self, params, candidates, point_validity):
+        """Runs the pruning steps of calculate_isochrones on the candidates"""
+        router = LinearBestIsoRouter(
+            polar_bavaria38, MockGrib(10, 270, 0.5), point_validity
+        )
+        for code, value in params.items():
+            router.set_param_value(code, value)
+        t = datetime.datetime.fromisoformat("2021-04-02T12:00:00")
+        start = Isochrone.from_points([IsoPoint((0, 0), time=t, next_wp_dist=20.0)])
+        candidates.prev_idx = np.zeros(len(candidates), dtype=np.intp)
+        with mock.patch.object(router, "_prune_sectors", return_value=candidates):
+            return router.calculate_isochrones(t, 1, [start], (20, 0))[-1]
+
+    def test_envelope_validity(self):
+        # the invalid point 2 sticks out of the frontier
+        brg = np.radians([-20.0, -10.0, 0.0, 10.0, 20.0])
+        candidates = Isochrone(
+            lat=np.arange(5.0),
+            los_brg=brg,
+            los_dist=np.array([10.0, 10.0, 14.0, 10.0, 10.0]) / np.cos(brg),
+            next_wp_dist=np.full(5, 10.0),
+        )
+        iso = self.run_pipeline(
+            {"envelope_pruning": True}, candidates, lambda lat, lon: lat != 2
+        )
+        self.assertEqual(iso.lat.tolist(), [0.0, 1.0, 3.0, 4.0])
+
+    def test_dedup_validity(self):
+        # the invalid point 1 is the best of the cell shared with point 0
+        candidates = Isochrone(
+            lat=[1.0, 1.0001, 2.0],
+            los_brg=np.radians([0.0, 1.0, 2.0]),
+            los_dist=np.full(3, 10.0),
+            next_wp_dist=[3.0, 2.0, 1.0],
+        )
+        iso = self.run_pipeline(
+            {"dedup_tolerance": 0.5}, candidates, lambda lat, lon: lat != 1.0001
+        )
+        self.assertEqual(iso.lat.tolist(), [1.0, 2.0])
+
+    def test_downsample_validity(self):
+        # the most advanced points 2 and 3 are invalid
+        candidates = Isochrone(
+            lat=np.arange(4.0),
+            los_brg=np.radians([0.0, 1.0, 2.0, 3.0]),
+            los_dist=np.full(4, 10.0),
+            next_wp_dist=[4.0, 3.0, 2.0, 1.0],
+        )
+        iso = self.run_pipeline(
+            {"max_points": 2}, candidates, lambda lat, lon: lat < 2.0
+        )
+        self.assertEqual(iso.lat.tolist(), [0.0, 1.0])
+
+    @parameterized.expand(
+        [
+            [{"envelope_pruning": True}],
+            [{"dedup_tolerance": 0.5}],
+            [{"max_points": 20}],
+        ]
+    )
+    def test_routing_validity(self, params):
+        # a barrier across the track, to be sailed around
+        def point_validity(lat, lon):
+            return not (4.7 < lat < 5.3 and 38.45 < lon < 38.55)
+
+        def line_validity(lat1, lon1, lat2, lon2):
+            return all(
+                point_validity(lat1 + (lat2 - lat1) * k, lon1 + (lon2 - lon1) * k)
+                for k in np.linspace(0, 1, 11)
+            )
+
+        def run(params):
+            routing_obj = weatherrouting.Routing(
+                LinearBestIsoRouter,
+                polar_bavaria38,
+                [(5, 38), (5, 39)],
+                MockGrib(5, 0, 0.1),
+                datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+                point_validity=point_validity,
+                line_validity=line_validity,
+            )
+            for code, value in params.items():
+                routing_obj.algorithm.set_param_value(code, value)
+            res = None
+            for _ in range(40):
+                res = routing_obj.step(timedelta=0.5)
+                if routing_obj.end:
+                    break
+            self.assertTrue(routing_obj.end)
+            return res
+
+        res = run({})
+        pruned_res = run(params)
+        self.assertLessEqual(
+            pruned_res.path[-1].time - res.path[-1].time,
+            datetime.timedelta(hours=0.5),
+        )
+        self.assertTrue(all(len(iso) > 0 for iso in pruned_res.isochrones))
+
+    @parameterized.expand(
+        [
+            [{"envelope_pruning": True}],
+            [{"dedup_tolerance": 0.5}],
+            [{"max_points": 40}],
+        ]
+    )
+    def test_routing(self, params):
+        track = [(5, 38), (5.6, 38.7)]
+        _, res = run_routing(LinearBestIsoRouter, track, MockGrib(10, 270, 0.5))
+        _, pruned_res = run_routing(
+            LinearBestIsoRouter, track, MockGrib(10, 270, 0.5), params
+        )
+        self.assertEqual(pruned_res.path[-1].time, res.path[-1].time)
+        if "max_points" in params:
+            self.assertTrue(all(len(iso) <= 40 for iso in pruned_res.isochrones))
+            self.assertGreater(pruned_res.isochrones[-1].dropped, 0)
+        self.assertLess(
+            sum(len(iso) for iso in pruned_res.isochrones),
+            sum(len(iso) for iso in res.isochrones),
+        )
+
+
+class TestCompactHistory(unittest.TestCase):
+    def test_compact(self):
+        isocrone = [
+            Isochrone(lat=[0.0]),
+            Isochrone(lat=[1.0, 2.0, 3.0], prev_idx=[0, 0, 0]),
+            Isochrone(lat=[4.0, 5.0, 6.0], prev_idx=[0, 2, 2]),
+            Isochrone(lat=[7.0, 8.0], prev_idx=[1, 2]),
+        ]
+        Router._compact_history(isocrone)
+
+        self.assertEqual([len(iso) for iso in isocrone], [1, 1, 2, 2])
+        self.assertEqual(isocrone[1].lat.tolist(), [3.0])
+        self.assertEqual(isocrone[2].prev_idx.tolist(), [0, 0])
+        self.assertEqual(isocrone[3].prev_idx.tolist(), [0, 1])
+
+    def test_routing(self):
+        track = [(5, 38), (5.6, 38.7)]
+        _, res = run_routing(LinearBestIsoRouter, track, MockGrib(10, 270, 0.5))
+        _, compact_res = run_routing(
+            LinearBestIsoRouter,
+            track,
+            MockGrib(10, 270, 0.5),
+            {"compact_history": True},
+        )
+
+        self.assertEqual(
+            [(p.pos, p.time, p.speed, p.brg) for p in compact_res.path],
+            [(p.pos, p.time, p.speed, p.brg) for p in res.path],
+        )
+        self.assertLess(
+            sum(len(iso) for iso in compact_res.isochrones),
+            sum(len(iso) for iso in res.isochrones),
+        )
+
+
+class TestBestPath(unittest.TestCase):
+    def test_cached_distances(self):
+        track = [(5, 38), (5.6, 38.7)]
+        routing_obj = weatherrouting.Routing(
+            LinearBestIsoRouter,
+            polar_bavaria38,
+            track,
+            MockGrib(10, 270, 0.5),
+            datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+        )
+        for _ in range(3):
+            res = routing_obj.step()
+        iso = res.isochrones[-1]
+        self.assertEqual(iso.target, track[1])
+
+        geodesy = routing_obj.algorithm.get_geodesy()
+        distances = geodesy.point_distance_many(5.6, 38.7, iso.lat, iso.lon)
+        expected = iso[int(np.argmin(distances))]
+        with mock.patch.object(geodesy, "point_distance_many") as point_distance_many:
+            self.assertEqual(routing_obj.get_current_best_path()[-1], expected)
+        point_distance_many.assert_not_called()
+
+
+class TestCorridor(unittest.TestCase):
+    def test_corridor_distance(self):
+        route = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+        distances = corridor_distance(
+            [0.5, 0.0, -1.0, 2.0], [0.5, 2.0, 0.0, 1.0], route
+        )
+        np.testing.assert_allclose(
+            distances, [30.0 * math.cos(math.radians(0.5)), 60.0, 60.0, 60.0]
+        )
+        np.testing.assert_allclose(
+            corridor_distance([1.0], [0.0], route[:1]), [60.0], rtol=1e-12
+        )
+
+    def test_filter(self):
+        track = [(5, 38), (5.6, 38.7)]
+        router_obj = LinearBestIsoRouter(polar_bavaria38, MockGrib(10, 270, 0.5))
+        router_obj.set_corridor(track)
+        router_obj.set_param_value("corridor_width", 5.0)
+        start = Isochrone.from_points([IsoPoint(track[0], next_wp_dist=100.0)])
+        time = datetime.datetime.fromisoformat("2021-04-02T12:00:00")
+        iso = router_obj.calculate_isochrones(time, 1, [start], track[1])[-1]
+
+        corridor = np.array(track, dtype=np.float64)
+        self.assertGreater(len(iso), 0)
+        self.assertTrue(np.all(corridor_distance(iso.lat, iso.lon, corridor) <= 5.0))
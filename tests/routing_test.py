@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from parameterized import parameterized
+
+import weatherrouting
+from weatherrouting.routers.linearbestisorouter import LinearBestIsoRouter
+
+from .mock_grib import MockGrib
+
+polar_bavaria38 = weatherrouting.Polar(
+    os.path.join(os.path.dirname(__file__), "data/bavaria38.pol")
+)
+
+
+class TestRouting(unittest.TestCase):
+    def run_routing(self, **kwargs):
+        routing_obj = weatherrouting.Routing(
+            LinearBestIsoRouter,
+            polar_bavaria38,
+            [(5, 38), (5.2, 38.2), (5.4, 38.2)],
+            MockGrib(10, 270, 0.5),
+            datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+            **kwargs,
+        )
+        results = []
+        while not routing_obj.end:
+            results.append(routing_obj.step())
+        return routing_obj, results
+
+    def test_path(self):
+        routing_obj, results = self.run_routing()
+        times = [p.time for p in routing_obj.path]
+
+        self.assertEqual(times, sorted(set(times)))
+        self.assertIs(results[-1].path, routing_obj.path)
+        # results of the steps not reaching a waypoint share the path list
+        self.assertIs(results[1].path, results[0].path)
+        self.assertEqual(len(routing_obj.log), len(results) - 1)
+
+    @parameterized.expand([[0], [2]])
+    def test_log_size(self, log_size):
+        routing_obj, results = self.run_routing(log_size=log_size)
+        full_routing_obj, full_results = self.run_routing()
+
+        self.assertEqual(list(routing_obj.log), results[-log_size - 1 : -1])
+        self.assertEqual(len(results), len(full_results))
+        self.assertEqual(
+            [p.to_list() for p in results[-1].path],
+            [p.to_list() for p in full_results[-1].path],
+        )
+        self.assertEqual(
+            [p.to_list() for p in routing_obj.get_current_best_path()],
+            [p.to_list() for p in full_routing_obj.get_current_best_path()],
+        )
+
+    def test_corridor(self):
+        routing_obj, results = self.run_routing(corridor_width=20.0)
+        full_routing_obj, full_results = self.run_routing()
+        coarse_path = routing_obj.coarse_result.path
+
+        self.assertEqual(coarse_path[0].pos, routing_obj.path[0].pos)
+        self.assertEqual(len(routing_obj.algorithm.corridor), len(coarse_path))
+        self.assertLessEqual(
+            results[-1].path[-1].time - full_results[-1].path[-1].time,
+            datetime.timedelta(hours=1),
+        )
+
+    @parameterized.expand([[False], [True]])
+    def test_custom_router(self, shared_executor):
+        class CustomRouter(LinearBestIsoRouter):
+            def __init__(self, polar, grib, pv, lv, psv, lsv):
+                super().__init__(polar, grib, pv, lv, psv, lsv)
+
+        executor = ThreadPoolExecutor() if shared_executor else None
+        routing_obj = weatherrouting.Routing(
+            CustomRouter,
+            polar_bavaria38,
+            [(5, 38), (5.2, 38.2)],
+            MockGrib(10, 270, 0.5),
+            datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
+            executor=executor,
+        )
+        with routing_obj:
+            while not routing_obj.end:
+                routing_obj.step()
+
+        self.assertIs(routing_obj.algorithm.executor, executor)
+        last = routing_obj.path[-1]
+        distance = weatherrouting.utils.point_distance(*last.pos, 5.2, 38.2)
+        self.assertLess(distance, last.speed * 1.1)
+        if executor is not None:
+            executor.shutdown()
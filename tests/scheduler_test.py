@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import os
+import unittest
+
+from parameterized import parameterized
+
+import weatherrouting
+from weatherrouting.routers.linearbestisorouter import LinearBestIsoRouter
+
+from .mock_grib import MockGrib
+
+polar_bavaria38 = weatherrouting.Polar(
+    os.path.join(os.path.dirname(__file__), "data/bavaria38.pol")
+)
+
+START = datetime.datetime.fromisoformat("2021-04-02T12:00:00")
+
+
+class GradientGrib:
+    """Southerly wind strengthening by gradient m/s per degree north of 38"""
+
+    def __init__(self, gradient):
+        self.gradient = gradient
+
+    def get_wind_at(self, t, lat, lon):
+        return (180.0, 8.0 + max(0.0, lat - 38.0) * self.gradient)
+
+
+class TestTimeStepScheduler(unittest.TestCase):
+    def get_algorithm(self, grib=None, point_validity=None):
+        return LinearBestIsoRouter(
+            polar_bavaria38, grib or MockGrib(8, 180, 0), point_validity
+        )
+
+    def test_offshore(self):
+        algorithm = self.get_algorithm()
+        scheduler = weatherrouting.TimeStepScheduler()
+
+        self.assertEqual(scheduler(algorithm, START, (5, 38), (7, 40)), 6.0)
+
+    @parameterized.expand([[(5.2, 38.2)], [(5.01, 38.01)]])
+    def test_waypoint(self, nextwp):
+        algorithm = self.get_algorithm()
+        scheduler = weatherrouting.TimeStepScheduler()
+        remaining = algorithm.get_geodesy().point_distance(5, 38, *nextwp)
+
+        self.assertEqual(
+            scheduler(algorithm, START, (5, 38), nextwp),
+            max(0.25, remaining / algorithm.get_max_speed() / 2),
+        )
+
+    @parameterized.expand([[True, 1.5], [False, 6.0]])
+    def test_validity(self, validity, expected):
+        # land north of 38.5, 0.5 degrees (30 nm) away
+        algorithm = self.get_algorithm(point_validity=lambda lat, lon: lat < 38.5)
+        scheduler = weatherrouting.TimeStepScheduler(validity=validity)
+
+        self.assertEqual(scheduler(algorithm, START, (38, 5), (41, 5)), expected)
+
+    @parameterized.expand([[0.0, None], [10.0, None], [10.0, 5.0], [0.0, 5.0]])
+    def test_wind_change(self, gradient, wind_change):
+        algorithm = self.get_algorithm(GradientGrib(gradient))
+        scheduler = weatherrouting.TimeStepScheduler(wind_change=wind_change)
+        dt = scheduler(algorithm, START, (38, 5), (41, 5))
+
+        if gradient and wind_change:
+            self.assertLess(dt, 6.0)
+            self.assertGreaterEqual(dt, 0.25)
+        else:
+            self.assertEqual(dt, 6.0)
+
+    def test_routing(self):
+        track = [(5, 38), (7, 40)]
+        results = {}
+        for scheduler in (None, weatherrouting.TimeStepScheduler(1.0)):
+            routing_obj = weatherrouting.Routing(
+                LinearBestIsoRouter,
+                polar_bavaria38,
+                track,
+                MockGrib(8, 180, 0),
+                START,
+                scheduler=scheduler,
+            )
+            steps = 0
+            while not routing_obj.end:
+                routing_obj.step()
+                steps += 1
+            results[scheduler is None] = (steps, routing_obj.path)
+
+        fixed_steps, fixed_path = results[True]
+        steps, path = results[False]
+        distance = weatherrouting.utils.point_distance(*path[-1].pos, *track[-1])
+        fixed_distance = weatherrouting.utils.point_distance(
+            *fixed_path[-1].pos, *track[-1]
+        )
+
+        self.assertLess(steps, fixed_steps / 2)
+        self.assertLessEqual(distance, fixed_distance)
+        self.assertLess(
+            abs(path[-1].time - fixed_path[-1].time), datetime.timedelta(hours=1)
+        )
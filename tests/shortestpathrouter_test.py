@@ -18,7 +18,7 @@ import json
 import unittest
 
 import weatherrouting
-from weatherrouting.routers.router import IsoPoint
+from weatherrouting.routers.router import FixedSpeedPointFunction, IsoPoint
 from weatherrouting.routers.shortestpathrouter import ShortestPathRouter
 
 from .mock_grib import MockGrib
@@ -38,6 +38,7 @@ class TestRoutingNoIsland(unittest.TestCase):
             datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
             point_validity=island_route.point_validity,
         )
+        self.routing_obj.algorithm.set_param_value("geodesy", "ellipsoidal")
 
     def test_step(self):
         res = None
@@ -55,7 +56,7 @@ class TestRoutingNoIsland(unittest.TestCase):
             res.time, datetime.datetime.fromisoformat("2021-04-02 14:00:00")
         )
         self.assertEqual(
-            len(json.dumps(weatherrouting.utils.path_as_geojson(path_to_end))), 1201
+            len(json.dumps(weatherrouting.utils.path_as_geojson(path_to_end))), 1215
         )
 
 
@@ -129,6 +130,7 @@ class TestRoutingCustomStep(unittest.TestCase):
             datetime.datetime.fromisoformat("2021-04-02T12:00:00"),
             point_validity=island_route.point_validity,
         )
+        self.routing_obj.algorithm.set_param_value("geodesy", "ellipsoidal")
 
     def test_step(self):
         res = None
@@ -146,5 +148,21 @@ class TestRoutingCustomStep(unittest.TestCase):
             res.time, datetime.datetime.fromisoformat("2021-04-02 14:00:00")
         )
         self.assertEqual(
-            len(json.dumps(weatherrouting.utils.path_as_geojson(path_to_end))), 1813
+            len(json.dumps(weatherrouting.utils.path_as_geojson(path_to_end))), 1827
+        )
+
+
+class TestMaxSpeed(unittest.TestCase):
+    def test_max_speed(self):
+        router = ShortestPathRouter(None, MockGrib(2, 180, 0.1))
+        router.set_param_value("fixed_speed", 6.0)
+        point_f = FixedSpeedPointFunction(6.0, router.get_geodesy())
+        distance = point_f.move(0.0, 0.0, 1.0)[0]
+        self.assertAlmostEqual(router.get_max_speed(), float(distance))
+
+        p = point_f((38.0, 5.0), 0.0, 0.0, 1.0, 0.0)[0]
+        self.assertAlmostEqual(
+            router.get_geodesy().point_distance(38.0, 5.0, *p),
+            router.get_max_speed(),
+            delta=0.01,
         )
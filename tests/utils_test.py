@@ -13,8 +13,11 @@
 # GNU General Public License for more details.
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
+import math
 import unittest
 
+import numpy as np
+
 import weatherrouting
 
 
@@ -28,3 +31,48 @@ class TestUtils(unittest.TestCase):
         p1 = (5, 38)
         maxd = weatherrouting.utils.max_reach_distance(p1, 5)
         self.assertAlmostEqual(maxd, 5.000000000000199, delta=0.001)
+
+        maxds = weatherrouting.utils.max_reach_distance_many([5, -2, 0], 0.5)
+        self.assertEqual(maxds.tolist(), [2.5, 1.0, 0.0])
+
+    def test_sphere_point_distance(self):
+        self.assertEqual(
+            round(weatherrouting.utils.sphere_point_distance(0.0, 0.0, 1 / 60, 0.0)), 1
+        )
+        d, brg = weatherrouting.utils.lossodromic(5, 38, 5.2, 38.3)
+        sd, sbrg = weatherrouting.utils.sphere_lossodromic(5, 38, 5.2, 38.3)
+        self.assertAlmostEqual(sd, d, delta=1e-6)
+        self.assertAlmostEqual(sbrg, brg, delta=0.01)
+
+    def test_sphere_routage_point_distance(self):
+        p = weatherrouting.utils.sphere_routage_point_distance(
+            5, 179.9, 20, math.radians(80)
+        )
+        self.assertLess(p[1], -179)
+        self.assertAlmostEqual(
+            weatherrouting.utils.sphere_point_distance(5, 179.9, p[0], p[1]),
+            20,
+            delta=1e-9,
+        )
+
+    def test_geodesy_many(self):
+        lats = np.array([5.0, 5.2, -40.0])
+        lons = np.array([38.0, 179.9, -10.0])
+        dists = np.array([3.0, 20.0, 0.0])
+        hdgs = np.radians([10.0, 80.0, 200.0])
+
+        plats, plons = weatherrouting.utils.routage_point_distance_many(
+            lats, lons, dists, hdgs
+        )
+        d = weatherrouting.utils.point_distance_many(lats, lons, plats, plons)
+        los_d, los_brg = weatherrouting.utils.lossodromic_many(5.0, 38.0, plats, plons)
+        for i in range(len(lats)):
+            p = weatherrouting.utils.sphere_routage_point_distance(
+                lats[i], lons[i], dists[i], hdgs[i]
+            )
+            self.assertAlmostEqual(plats[i], p[0], delta=1e-9)
+            self.assertAlmostEqual(plons[i], p[1], delta=1e-9)
+            self.assertAlmostEqual(d[i], dists[i], delta=1e-9)
+            los = weatherrouting.utils.sphere_lossodromic(5.0, 38.0, p[0], p[1])
+            self.assertAlmostEqual(los_d[i], los[0], delta=1e-9)
+            self.assertAlmostEqual(los_brg[i], los[1], delta=1e-9)
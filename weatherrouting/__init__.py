@@ -12,8 +12,16 @@
 # GNU General Public License for more details.
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
+from .geodesy import (  # noqa: F401  # isort: skip
+    EllipsoidalGeodesy,
+    FlatGeodesy,
+    Geodesy,
+    SphericalGeodesy,
+)
 from .grib import Grib  # noqa: F401
 from .polar import Polar, PolarError  # noqa: F401
+from .polarregistry import PolarRegistry  # noqa: F401
 from .routers import *  # noqa: F401, F403
 from .routing import Routing, list_routing_algorithms  # noqa: F401
+from .scheduler import TimeStepScheduler  # noqa: F401
 from .utils import *  # noqa: F401, F403
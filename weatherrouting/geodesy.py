@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+from . import utils
+
+
+class Geodesy(ABC):
+    """
+    Geodesy is an abstract class defining the earth model used by routers; the _many
+    methods are the numpy versions of the scalar ones (inputs are broadcasted together)
+    and by default loop over them
+    """
+
+    @abstractmethod
+    def point_distance(
+        self, lat_a: float, lon_a: float, lat_b: float, lon_b: float, unit: str = "nm"
+    ) -> float:
+        """Returns the distance between two geo points"""
+        raise Exception("Not implemented")
+
+    @abstractmethod
+    def routage_point_distance(
+        self, lat_a: float, lon_a: float, distance: float, hdg: float, unit: str = "nm"
+    ) -> Tuple[float, float]:
+        """Returns the point from (lat_a, lon_a) to the given (distance, hdg radians)"""
+        raise Exception("Not implemented")
+
+    @abstractmethod
+    def lossodromic(
+        self, lat_a: float, lon_a: float, lat_b: float, lon_b: float
+    ) -> Tuple[float, float]:
+        """Returns the distance in km between A and B and the initial bearing in
+        radians (-pi..pi) from A to B"""
+        raise Exception("Not implemented")
+
+    def point_distance_many(
+        self, lats_a, lons_a, lats_b, lons_b, unit: str = "nm"
+    ) -> np.ndarray:
+        args = np.broadcast_arrays(lats_a, lons_a, lats_b, lons_b)
+        d = [
+            self.point_distance(la, loa, lb, lob, unit)
+            for la, loa, lb, lob in zip(*(a.ravel() for a in args))
+        ]
+        return np.array(d, dtype=np.float64).reshape(args[0].shape)
+
+    def routage_point_distance_many(
+        self, lats, lons, distances, headings, unit: str = "nm"
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        args = np.broadcast_arrays(lats, lons, distances, headings)
+        p = np.array(
+            [
+                self.routage_point_distance(la, lo, d, h, unit)
+                for la, lo, d, h in zip(*(a.ravel() for a in args))
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        return (p[:, 0].reshape(args[0].shape), p[:, 1].reshape(args[0].shape))
+
+    def lossodromic_many(
+        self, lats_a, lons_a, lats_b, lons_b
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        args = np.broadcast_arrays(lats_a, lons_a, lats_b, lons_b)
+        los = np.array(
+            [
+                self.lossodromic(la, loa, lb, lob)
+                for la, loa, lb, lob in zip(*(a.ravel() for a in args))
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        return (los[:, 0].reshape(args[0].shape), los[:, 1].reshape(args[0].shape))
+
+
+class SphericalGeodesy(Geodesy):
+    """Great circle geodesy on a sphere with plain math, fast"""
+
+    def point_distance(self, lat_a, lon_a, lat_b, lon_b, unit="nm"):
+        return utils.sphere_point_distance(lat_a, lon_a, lat_b, lon_b, unit)
+
+    def routage_point_distance(self, lat_a, lon_a, distance, hdg, unit="nm"):
+        return utils.sphere_routage_point_distance(lat_a, lon_a, distance, hdg, unit)
+
+    def lossodromic(self, lat_a, lon_a, lat_b, lon_b):
+        return utils.sphere_lossodromic(lat_a, lon_a, lat_b, lon_b)
+
+    def point_distance_many(self, lats_a, lons_a, lats_b, lons_b, unit="nm"):
+        return utils.point_distance_many(lats_a, lons_a, lats_b, lons_b, unit)
+
+    def routage_point_distance_many(self, lats, lons, distances, headings, unit="nm"):
+        return utils.routage_point_distance_many(lats, lons, distances, headings, unit)
+
+    def lossodromic_many(self, lats_a, lons_a, lats_b, lons_b):
+        return utils.lossodromic_many(lats_a, lons_a, lats_b, lons_b)
+
+
+class FlatGeodesy(Geodesy):
+    """Local flat earth (equirectangular projection at the mean latitude) geodesy,
+    the fastest; only suited for short coastal hops"""
+
+    def point_distance(self, lat_a, lon_a, lat_b, lon_b, unit="nm"):
+        return float(self.point_distance_many(lat_a, lon_a, lat_b, lon_b, unit))
+
+    def routage_point_distance(self, lat_a, lon_a, distance, hdg, unit="nm"):
+        lat, lon = self.routage_point_distance_many(lat_a, lon_a, distance, hdg, unit)
+        return (float(lat), float(lon))
+
+    def lossodromic(self, lat_a, lon_a, lat_b, lon_b):
+        d, brg = self.lossodromic_many(lat_a, lon_a, lat_b, lon_b)
+        return (float(d), float(brg))
+
+    @staticmethod
+    def _deltas(lats_a, lons_a, lats_b, lons_b) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the (north, east) components in radians of the vectors from A to B"""
+        dl = (np.subtract(lons_b, lons_a) + 540.0) % 360.0 - 180.0
+        pm = np.radians(np.add(lats_a, lats_b) / 2)
+        return (np.radians(np.subtract(lats_b, lats_a)), np.cos(pm) * np.radians(dl))
+
+    def point_distance_many(self, lats_a, lons_a, lats_b, lons_b, unit="nm"):
+        dn, de = self._deltas(lats_a, lons_a, lats_b, lons_b)
+        d = utils.SPHERE_RADIUS * np.hypot(dn, de)
+        if unit == "nm":
+            return d * utils.km2nm(1.0)
+        return d
+
+    def routage_point_distance_many(self, lats, lons, distances, headings, unit="nm"):
+        d = np.asarray(distances, dtype=np.float64)
+        if unit == "nm":
+            d = d * utils.nm2km(1.0)
+
+        d = d / utils.SPHERE_RADIUS
+        dn = d * np.cos(headings)
+        pm = np.radians(lats) + dn / 2
+        lon = (
+            np.add(lons, np.degrees(d * np.sin(headings) / np.cos(pm))) + 540.0
+        ) % 360.0
+        return (np.add(lats, np.degrees(dn)), lon - 180.0)
+
+    def lossodromic_many(self, lats_a, lons_a, lats_b, lons_b):
+        dn, de = self._deltas(lats_a, lons_a, lats_b, lons_b)
+        return (utils.SPHERE_RADIUS * np.hypot(dn, de), np.arctan2(de, dn))
+
+
+class EllipsoidalGeodesy(Geodesy):
+    """Geodesy on the WGS84 ellipsoid using latlon3, accurate but slow"""
+
+    def point_distance(self, lat_a, lon_a, lat_b, lon_b, unit="nm"):
+        return utils.point_distance(lat_a, lon_a, lat_b, lon_b, unit)
+
+    def routage_point_distance(self, lat_a, lon_a, distance, hdg, unit="nm"):
+        return utils.routage_point_distance(lat_a, lon_a, distance, hdg, unit)
+
+    def lossodromic(self, lat_a, lon_a, lat_b, lon_b):
+        return utils.lossodromic(lat_a, lon_a, lat_b, lon_b)
+
+
+GEODESY_BACKENDS: Dict[str, Geodesy] = {
+    "spherical": SphericalGeodesy(),
+    "flat": FlatGeodesy(),
+    "ellipsoidal": EllipsoidalGeodesy(),
+}
+
+
+def get_geodesy(geodesy: Union[str, Geodesy]) -> Geodesy:
+    """Returns the geodesy backend registered with the given name; Geodesy instances
+    are returned as they are"""
+    if isinstance(geodesy, Geodesy):
+        return geodesy
+    if geodesy not in GEODESY_BACKENDS:
+        raise Exception(f"Invalid geodesy: {geodesy}")
+    return GEODESY_BACKENDS[geodesy]
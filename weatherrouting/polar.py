@@ -15,9 +15,18 @@
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
 import math
-import re
-from io import TextIOWrapper
-from typing import Dict, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union, overload
+
+import numpy as np
+
+from .utils import LRUCache
+
+ArrayLike = Union[float, np.ndarray]
+
+
+# Version of the save_compiled file format
+COMPILED_VERSION = 1
 
 
 class PolarError(Exception):
@@ -25,7 +34,18 @@ class PolarError(Exception):
 
 
 class Polar:
-    def __init__(self, polar_path: str, f: Optional[TextIOWrapper] = None):
+    def __init__(
+        self,
+        polar_path: str,
+        f: Optional[TextIO] = None,
+        gridded: bool = False,
+        grid_tws_step: float = 0.1,
+        grid_twa_step: float = 0.5,
+        grid_max_error: Optional[float] = None,
+        vmg_cache_size: int = 4096,
+        vmg_tws_quantum: float = 0.1,
+        vmg_twa_quantum: float = 1.0,
+    ):
         """
         Parameters
         ----------
@@ -33,33 +53,182 @@ class Polar:
                 Path of the polar file
         f : File
                 File object for passing an opened file
+        gridded : bool
+                Optional, default to False
+                If True, the polar is resampled on a dense regular grid at load time and
+                get_speed is answered by direct indexing (see build_grid)
+        grid_tws_step : float
+                Optional, default to 0.1
+                Grid resolution on the tws axis (in knots)
+        grid_twa_step : float
+                Optional, default to 0.5
+                Grid resolution on the twa axis (in degrees)
+        grid_max_error : float
+                Optional, default to None
+                Maximum allowed speed error (in knots) of the grid versus the exact
+                interpolation; the grid is refined until the bound is met
+        vmg_cache_size : int
+                Optional, default to 4096
+                Maximum number of entries kept by the VMG and reaching caches
+        vmg_tws_quantum : float
+                Optional, default to 0.1
+                VMG and reaching queries are computed and cached for tws rounded to
+                this step (in knots)
+        vmg_twa_quantum : float
+                Optional, default to 1.0
+                VMG queries are computed and cached for twa rounded to this step
+                (in degrees)
         """
-        self.validate_file(polar_path)
-
-        self.tws = []
-        self.twa = []
-        self.vmgdict: Dict[Tuple[float, float], Tuple[float, float]] = {}
-        self.speed_table = []
-
         if f is None:
-            f = open(polar_path, "r")
-
-        tws = f.readline().split()
-        for i in range(1, len(tws)):
-            self.tws.append(float(tws[i].replace("\x02", "")))
-
-        line = f.readline()
-        while line != "":
-            data = line.split()
-            twa = float(data[0])
-            self.twa.append(math.radians(twa))
-            speedline = []
-            for i in range(1, len(data)):
-                speed = float(data[i])
-                speedline.append(speed)
-            self.speed_table.append(speedline)
-            line = f.readline()
-        f.close()
+            with open(polar_path, "r") as f:
+                tws, twa, speed_table = self.parse(f)
+        else:
+            tws, twa, speed_table = self.parse(f)
+            f.close()
+
+        self._setup(
+            tws,
+            twa,
+            speed_table,
+            gridded,
+            grid_tws_step,
+            grid_twa_step,
+            grid_max_error,
+            vmg_cache_size,
+            vmg_tws_quantum,
+            vmg_twa_quantum,
+        )
+
+    def _setup(
+        self,
+        tws,
+        twa,
+        speed_table,
+        gridded: bool = False,
+        grid_tws_step: float = 0.1,
+        grid_twa_step: float = 0.5,
+        grid_max_error: Optional[float] = None,
+        vmg_cache_size: int = 4096,
+        vmg_tws_quantum: float = 0.1,
+        vmg_twa_quantum: float = 1.0,
+    ) -> None:
+        self._set_tables(tws, twa, speed_table)
+        self._init_caches(vmg_cache_size, vmg_tws_quantum, vmg_twa_quantum)
+
+        if gridded:
+            self.build_grid(grid_tws_step, grid_twa_step, grid_max_error)
+
+    def save_compiled(self, path) -> None:
+        """Saves the polar tables in a compact binary (numpy .npz) file, that can be
+        loaded by load_compiled without text parsing and validation; the file is
+        written at path as given (no .npz suffix is added)"""
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(COMPILED_VERSION),
+                tws=self.tws,
+                twa=self.twa,
+                speed_table=self.speed_table,
+            )
+
+    @classmethod
+    def load_compiled(cls, path, **kwargs) -> "Polar":
+        """Loads a polar saved by save_compiled; kwargs are the same optional arguments
+        of the Polar constructor (gridded, grid_*, vmg_*)"""
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != COMPILED_VERSION:
+                    raise PolarError("COMPILED_VERSION_MISMATCH")
+                tws, twa, speed_table = data["tws"], data["twa"], data["speed_table"]
+        except (KeyError, ValueError, OSError) as e:
+            raise PolarError("INVALID_COMPILED_FILE") from e
+
+        polar = cls.__new__(cls)
+        polar._setup(tws, twa, speed_table, **kwargs)
+        return polar
+
+    def _set_tables(self, tws, twa, speed_table) -> None:
+        """Stores the polar tables as numpy arrays (tws in knots, twa in radians,
+        speed_table indexed as [twa][tws]) along with plain list copies used by
+        the scalar lookup path"""
+        self.tws = np.asarray(tws, dtype=np.float64)
+        self.twa = np.asarray(twa, dtype=np.float64)
+        self.speed_table = np.asarray(speed_table, dtype=np.float64).reshape(
+            len(self.twa), len(self.tws)
+        )
+
+        self._tws_list = self.tws.tolist()
+        self._twa_list = self.twa.tolist()
+        self._speed_rows = self.speed_table.tolist()
+
+        self.grid_info: Optional[Dict[str, Any]] = None
+
+    def _init_caches(
+        self, vmg_cache_size: int, vmg_tws_quantum: float, vmg_twa_quantum: float
+    ) -> None:
+        self.vmgdict = LRUCache(vmg_cache_size)
+        self._reaching_cache = LRUCache(vmg_cache_size)
+        self._vmg_tws_inv = 1.0 / vmg_tws_quantum
+        self._vmg_twa_inv = 1.0 / math.radians(vmg_twa_quantum)
+
+    def build_grid(
+        self,
+        tws_step: float = 0.1,
+        twa_step: float = 0.5,
+        max_error: Optional[float] = None,
+        max_refinements: int = 4,
+    ) -> Dict[str, Any]:
+        """Resamples the polar on a regular grid of tws_step (knots) by twa_step (degrees)
+        covering tws from 0 to the table maximum and twa from 0 to 180 degrees; once
+        built, get_speed returns the speed of the nearest grid node.
+
+        If max_error is given, both steps are halved (up to max_refinements times) until
+        the maximum error versus the exact interpolation is within the bound, otherwise
+        PolarError is raised.
+
+        Returns grid_info, a dict reporting the grid resolution, shape, memory size and
+        the maximum interpolation error (in knots)."""
+        for _ in range(max_refinements + 1):
+            grid, err = self._resample(tws_step, twa_step)
+            if max_error is None or err <= max_error:
+                break
+            tws_step /= 2.0
+            twa_step /= 2.0
+        else:
+            raise PolarError("GRID_ERROR_BOUND")
+
+        self._grid: np.ndarray = grid
+        self._grid_tws_inv = 1.0 / tws_step
+        self._grid_twa_inv = 1.0 / math.radians(twa_step)
+        self.grid_info = {
+            "tws_step": tws_step,
+            "twa_step": twa_step,
+            "shape": grid.shape,
+            "nbytes": grid.nbytes,
+            "max_error": err,
+        }
+        return self.grid_info
+
+    def _resample(self, tws_step: float, twa_step: float) -> Tuple[np.ndarray, float]:
+        """Returns the (tws, twa) grid for the given steps and its maximum error, measured
+        at the corners of each node cell (the farthest points answered by that node)"""
+        ntws = int(math.ceil(self.tws[-1] / tws_step)) + 1
+        ntwa = int(math.ceil(180.0 / twa_step)) + 1
+        tws = np.arange(ntws) * tws_step
+        twa = np.radians(np.arange(ntwa) * twa_step)
+        grid = self._get_speed_array(tws[:, None], twa[None, :]).astype(np.float32)
+
+        tws_c = np.clip((np.arange(ntws + 1) - 0.5) * tws_step, 0.0, tws[-1])
+        twa_c = np.clip(
+            np.radians((np.arange(ntwa + 1) - 0.5) * twa_step), 0.0, math.pi
+        )
+        corners = self._get_speed_array(tws_c[:, None], twa_c[None, :])
+        err = 0.0
+        for di in (0, 1):
+            for dj in (0, 1):
+                c = corners[di : di + ntws, dj : dj + ntwa]
+                err = max(err, float(np.max(np.abs(c - grid))))
+        return grid, err
 
     def to_string(self) -> str:
         s = "TWA\\TWS"
@@ -80,78 +249,157 @@ class Polar:
 
         return s
 
-    def get_speed(self, tws: float, twa: float) -> float:  # noqa: C901
-        """Returns the speed (in knots) given tws (in knots) and twa (in radians)"""
+    @overload
+    def get_speed(self, tws: float, twa: float) -> float: ...  # noqa: E704
+
+    @overload
+    def get_speed(self, tws: ArrayLike, twa: ArrayLike) -> Any: ...  # noqa: E704
+
+    def get_speed(self, tws: ArrayLike, twa: ArrayLike) -> ArrayLike:
+        """Returns the speed (in knots) given tws (in knots) and twa (in radians)
 
-        tws1 = 0
-        tws2 = 0
+        tws and twa can be scalars or numpy arrays (broadcasted together); scalar
+        inputs return a float, array inputs return an array of speeds"""
+        if isinstance(tws, (int, float)) and isinstance(twa, (int, float)):
+            if self.grid_info is not None:
+                return self._get_speed_grid_scalar(tws, twa)
+            return self._get_speed_scalar(tws, twa)
+
+        if self.grid_info is not None:
+            speed = self._get_speed_grid_array(tws, twa)
+        else:
+            speed = self._get_speed_array(tws, twa)
+        if speed.ndim == 0:
+            return float(speed)
+        return speed
 
-        for k in range(0, len(self.tws)):
-            if tws >= self.tws[k]:
-                tws1 = k
-        for k in range(len(self.tws) - 1, 0, -1):
-            if tws <= self.tws[k]:
-                tws2 = k
+    @staticmethod
+    def _bracket(values, x: float) -> Tuple[int, int]:
+        """Returns the indexes of the table values bracketing x"""
+        n = len(values)
+        i1 = max(bisect_right(values, x) - 1, 0)
+        i2 = bisect_left(values, x)
+        if i2 >= n:
+            i2 = 0
+        elif i2 == 0:
+            i2 = min(1, n - 1)
+        return i1, i2
+
+    @staticmethod
+    def _bracket_array(
+        values: np.ndarray, x: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized version of _bracket"""
+        n = len(values)
+        i1 = np.maximum(np.searchsorted(values, x, side="right") - 1, 0)
+        i2 = np.searchsorted(values, x, side="left")
+        i2 = np.where(i2 >= n, 0, np.where(i2 == 0, min(1, n - 1), i2))
+        return i1, i2
+
+    def _get_speed_scalar(self, tws: float, twa: float) -> float:
+        tws1, tws2 = self._bracket(self._tws_list, tws)
         if tws1 > tws2:  # TWS over table limits
-            tws2 = len(self.tws) - 1
-        twa1 = 0
-        twa2 = 0
-        for k in range(0, len(self.twa)):
-            if twa >= self.twa[k]:
-                twa1 = k
-        for k in range(len(self.twa) - 1, 0, -1):
-            if twa <= self.twa[k]:
-                twa2 = k
-
-        speed1 = self.speed_table[twa1][tws1]
-        speed2 = self.speed_table[twa2][tws1]
-        speed3 = self.speed_table[twa1][tws2]
-        speed4 = self.speed_table[twa2][tws2]
+            tws2 = len(self._tws_list) - 1
+        twa1, twa2 = self._bracket(self._twa_list, twa)
+
+        speed1 = self._speed_rows[twa1][tws1]
+        speed2 = self._speed_rows[twa2][tws1]
+        speed3 = self._speed_rows[twa1][tws2]
+        speed4 = self._speed_rows[twa2][tws2]
 
         if twa1 != twa2:
-            speed12 = speed1 + (speed2 - speed1) * (twa - self.twa[twa1]) / (
-                self.twa[twa2] - self.twa[twa1]
-            )  # interpolazione su twa
-            speed34 = speed3 + (speed4 - speed3) * (twa - self.twa[twa1]) / (
-                self.twa[twa2] - self.twa[twa1]
-            )  # interpolazione su twa
+            f = (twa - self._twa_list[twa1]) / (
+                self._twa_list[twa2] - self._twa_list[twa1]
+            )
+            speed12 = speed1 + (speed2 - speed1) * f  # interpolazione su twa
+            speed34 = speed3 + (speed4 - speed3) * f  # interpolazione su twa
         else:
             speed12 = speed1
             speed34 = speed3
         if tws1 != tws2:
-            speed = speed12 + (speed34 - speed12) * (tws - self.tws[tws1]) / (
-                self.tws[tws2] - self.tws[tws1]
+            speed = speed12 + (speed34 - speed12) * (tws - self._tws_list[tws1]) / (
+                self._tws_list[tws2] - self._tws_list[tws1]
             )
         else:
             speed = speed12
         return speed
 
+    def _get_speed_array(self, tws: ArrayLike, twa: ArrayLike) -> np.ndarray:
+        tws, twa = np.broadcast_arrays(
+            np.asarray(tws, dtype=np.float64), np.asarray(twa, dtype=np.float64)
+        )
+
+        tws1, tws2 = self._bracket_array(self.tws, tws)
+        tws2 = np.where(tws1 > tws2, len(self.tws) - 1, tws2)  # TWS over table limits
+        twa1, twa2 = self._bracket_array(self.twa, twa)
+
+        speed1 = self.speed_table[twa1, tws1]
+        speed2 = self.speed_table[twa2, tws1]
+        speed3 = self.speed_table[twa1, tws2]
+        speed4 = self.speed_table[twa2, tws2]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f = np.where(
+                twa1 != twa2,
+                (twa - self.twa[twa1]) / (self.twa[twa2] - self.twa[twa1]),
+                0.0,
+            )
+            speed12 = speed1 + (speed2 - speed1) * f
+            speed34 = speed3 + (speed4 - speed3) * f
+
+            g = np.where(
+                tws1 != tws2,
+                (tws - self.tws[tws1]) / (self.tws[tws2] - self.tws[tws1]),
+                0.0,
+            )
+        return speed12 + (speed34 - speed12) * g
+
+    def _get_speed_grid_scalar(self, tws: float, twa: float) -> float:
+        ni, nj = self._grid.shape
+        i = min(max(int(tws * self._grid_tws_inv + 0.5), 0), ni - 1)
+        j = min(max(int(twa * self._grid_twa_inv + 0.5), 0), nj - 1)
+        return self._grid.item(i, j)
+
+    def _get_speed_grid_array(self, tws: ArrayLike, twa: ArrayLike) -> np.ndarray:
+        grid = self._grid
+        i = np.floor(np.asarray(tws, dtype=np.float64) * self._grid_tws_inv + 0.5)
+        j = np.floor(np.asarray(twa, dtype=np.float64) * self._grid_twa_inv + 0.5)
+        i = np.clip(i, 0, grid.shape[0] - 1).astype(np.intp)
+        j = np.clip(j, 0, grid.shape[1] - 1).astype(np.intp)
+        return grid[i, j].astype(np.float64)
+
     def get_reaching(self, tws: float) -> Tuple[float, float]:
-        maxspeed = 0.0
-        twamaxspeed = 0.0
-        for twa_ in range(0, 181):
-            twa = math.radians(twa_)
-            speed = self.get_speed(tws, twa)
-            if speed > maxspeed:
-                maxspeed = speed
-                twamaxspeed = twa
-        return (maxspeed, twamaxspeed)
+        """Returns (maxspeed, twa) of the fastest twa for the given tws"""
+        k = round(tws * self._vmg_tws_inv)
+        res = self._reaching_cache.get(k)
+        if res is None:
+            twa = np.radians(np.arange(0, 181))
+            speed = self.get_speed(k / self._vmg_tws_inv, twa)
+            i = int(np.argmax(speed))
+            if speed[i] > 0.0:
+                res = (float(speed[i]), float(twa[i]))
+            else:
+                res = (0.0, 0.0)
+            self._reaching_cache.put(k, res)
+        return res
 
     def get_max_vmgtwa(self, tws: float, twa: float) -> Tuple[float, float]:
-        if (tws, twa) not in self.vmgdict:
+        """Returns (maxvmg, twa) of the best VMG course projected on the direction
+        twa radians off the wind, for the given tws"""
+        key = (round(tws * self._vmg_tws_inv), round(twa * self._vmg_twa_inv))
+        res = self.vmgdict.get(key)
+        if res is None:
+            tws = key[0] / self._vmg_tws_inv
+            twa = key[1] / self._vmg_twa_inv
             twamin = max(0, twa - math.pi / 2)
             twamax = min(math.pi, twa + math.pi / 2)
-            alfa = twamin
-            maxvmg = -1.0
-            while alfa < twamax:
-                v = self.get_speed(tws, alfa)
-                vmg = v * math.cos(alfa - twa)
-                if vmg - maxvmg > 10**-3:  # 10**-3 errore tollerato
-                    maxvmg = vmg
-                    twamaxvmg = alfa
-                alfa = alfa + math.radians(1)
-            self.vmgdict[tws, twa] = (maxvmg, twamaxvmg)
-        return self.vmgdict[(tws, twa)]
+            alfa = np.arange(twamin, twamax, math.radians(1))
+            vmg = self.get_speed(tws, alfa) * np.cos(alfa - twa)
+            # first angle within 10**-3 (errore tollerato) of the best vmg
+            i = int(np.argmax(vmg >= np.max(vmg) - 10**-3))
+            res = (float(vmg[i]), float(alfa[i]))
+            self.vmgdict.put(key, res)
+        return res
 
     def get_max_vmg_up(self, tws: float) -> Tuple[float, float]:
         vmguptupla = self.get_max_vmgtwa(tws, 0)
@@ -204,29 +452,58 @@ class Polar:
         Returns True if valid, raises PolarError with specific message if invalid.
         """
         with open(filepath, "r") as f:
-            content = f.read()
-        lines = content.strip().split("\n")
+            Polar.parse(f)
+
+        return True
+
+    @staticmethod
+    def parse(f) -> Tuple[List[float], List[float], List[List[float]]]:
+        """Parses and validates a polar file in a single pass.
+
+        Returns (tws, twa, speed_table) with tws in knots and twa in radians, raises
+        PolarError with specific message if invalid.
+        """
+        lines = iter(f)
+
+        # Skip leading blank lines
+        header_parts: List[str] = []
+        for line in lines:
+            header_parts = line.split()
+            if header_parts:
+                break
 
         # Check for empty file
-        if len(lines) == 1 and not lines[0] or not lines[0]:
+        if not header_parts:
             raise PolarError("EMPTY_FILE")
 
         # Process header (wind speeds)
-        Polar._validate_header(lines[0])
+        tws = Polar._validate_header(header_parts)
 
         # Check data rows
-        header_parts = re.split(r"\s+", lines[0].strip())
         expected_columns = len(header_parts)
+        twa = []
+        speed_table = []
+        empty_lines = 0
 
-        for line in lines[1:]:
-            Polar._validate_data_row(line, expected_columns)
+        for line in lines:
+            parts = line.split()
 
-        return True
+            # Empty lines are only allowed at the end of the file
+            if not parts:
+                empty_lines += 1
+                continue
+            if empty_lines:
+                raise PolarError("EMPTY_LINE")
+
+            twa_, speeds = Polar._validate_data_row(parts, expected_columns)
+            twa.append(math.radians(twa_))
+            speed_table.append(speeds)
+
+        return tws, twa, speed_table
 
     @staticmethod
-    def _validate_header(header_line):
-        """Validates the header line containing wind speeds."""
-        header_parts = re.split(r"\s+", header_line.strip())
+    def _validate_header(header_parts):
+        """Validates the header line containing wind speeds, returns the wind speeds."""
 
         # Try to parse wind speeds (should be numeric)
         try:
@@ -238,29 +515,21 @@ class Polar:
         if not all(tws[i] <= tws[i + 1] for i in range(len(tws) - 1)):
             raise PolarError("WIND_SPEEDS_NOT_INCREASING")
 
-        return True
+        return tws
 
     @staticmethod
-    def _validate_data_row(line, expected_columns):
-        """Validates a single data row in the polar file."""
-        parts = re.split(r"\s+", line.strip())
-
-        # Skip empty lines
-        if not parts or (len(parts) == 1 and not parts[0]):
-            raise PolarError("EMPTY_LINE")
+    def _validate_data_row(parts, expected_columns):
+        """Validates a single data row in the polar file, returns (twa, speeds)."""
 
         # Check number of columns
         if len(parts) != expected_columns:
             raise PolarError("COLUMN_COUNT_MISMATCH")
 
         # Validate TWA
-        Polar._validate_twa(parts[0])
+        twa = Polar._validate_twa(parts[0])
 
         # Validate boat speeds
-        for speed in parts[1:]:
-            Polar._validate_boat_speed(speed)
-
-        return True
+        return twa, [Polar._validate_boat_speed(speed) for speed in parts[1:]]
 
     @staticmethod
     def _validate_twa(twa_str):
@@ -272,7 +541,7 @@ class Polar:
         except ValueError:
             raise PolarError("TWA_NOT_NUMERIC")
 
-        return True
+        return twa
 
     @staticmethod
     def _validate_boat_speed(speed_str):
@@ -287,6 +556,6 @@ class Polar:
         except ValueError:
             raise PolarError("SPEED_NOT_NUMERIC")
 
-        return True
+        return boat_speed
 
     # ---- End validate function ----
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import hashlib
+import io
+import os
+import threading
+from typing import Dict, List, Tuple
+
+from .polar import Polar, PolarError
+from .utils import LRUCache
+
+
+class PolarRegistry:
+    """
+    PolarRegistry indexes a directory of polar files and lazily loads them on first use;
+    loaded polars are deduplicated by content hash and kept in a size-bounded cache, so
+    the same Polar object (tables and VMG caches) is shared read-only between all the
+    routings using it
+    """
+
+    def __init__(self, directory: str, max_size: int = 32, extension=".pol", **kwargs):
+        """
+        Parameters
+        ----------
+        directory : string
+                Path of the directory containing the polar files
+        max_size : int
+                Optional, default to 32
+                Maximum number of parsed polars kept in memory
+        extension : string
+                Optional, default to ".pol"
+                Extension of the polar files to index
+        kwargs
+                Optional arguments passed to the Polar constructor (gridded, grid_*,
+                vmg_*)
+        """
+        self.directory = directory
+        self.extension = extension
+        self.polar_kwargs = kwargs
+        self._cache = LRUCache(max_size)
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Rescans the directory; no polar file is parsed"""
+        paths = {}
+        for entry in os.scandir(self.directory):
+            name, ext = os.path.splitext(entry.name)
+            if ext == self.extension and entry.is_file():
+                paths[name] = entry.path
+        self._paths = paths
+
+    def names(self) -> List[str]:
+        """Returns the sorted list of indexed polar names"""
+        return sorted(self._paths)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._paths
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def get(self, name: str) -> Polar:
+        """Returns the Polar object for the given name (the file name without
+        extension), loading it if it is not cached"""
+        if name not in self._paths:
+            raise PolarError("POLAR_NOT_FOUND")
+        path = self._paths[name]
+
+        st = os.stat(path)
+        known = self._digests.get(name)
+        if known and known[:2] == (st.st_mtime_ns, st.st_size):
+            polar = self._cache.get(known[2])
+            if polar is not None:
+                return polar
+
+        with self._lock:
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha1(data).hexdigest()
+            self._digests[name] = (st.st_mtime_ns, st.st_size, digest)
+
+            polar = self._cache.get(digest)
+            if polar is None:
+                polar = Polar(path, io.StringIO(data.decode()), **self.polar_kwargs)
+                for table in (polar.tws, polar.twa, polar.speed_table):
+                    table.setflags(write=False)
+                self._cache.put(digest, polar)
+        return polar
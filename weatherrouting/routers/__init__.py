@@ -12,4 +12,10 @@
 # GNU General Public License for more details.
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
-from .router import IsoPoint, RoutingNoWindError, RoutingResult  # noqa: F401
+from .router import (  # noqa: F401
+    Isochrone,
+    IsoPoint,
+    RoutingNoPathError,
+    RoutingNoWindError,
+    RoutingResult,
+)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+from typing import Any, List, Optional
+
+import numpy as np
+
+from .. import utils
+from .linearbestisorouter import LinearBestIsoRouter
+from .router import Isochrone, IsoPoint, RouterParam
+
+# positions per axis of the grid, and maximum number of instants, at which the
+# forecast is sampled for the tws range of the pruning bound
+FORECAST_GRID = 4
+FORECAST_TIMES = 8
+
+
+class HeuristicIsoRouter(LinearBestIsoRouter):
+    """
+    LinearBestIsoRouter dropping the isochrone points that cannot beat a completed
+    route (the incumbent, eg the coarse one of Routing.run_coarse), A* style: the
+    optimistic arrival of a point is its time plus its distance to the waypoint sailed
+    at the maximum boat speed of the polar over the tws range of the forecast until
+    the arrival of the incumbent, and a point is dropped when it is later than the
+    arrival of the incumbent at the waypoint plus incumbent_margin; without an
+    incumbent no point is dropped
+    """
+
+    PARAMS = {
+        **LinearBestIsoRouter.PARAMS,
+        "incumbent_margin": RouterParam(
+            "incumbent_margin",
+            "Incumbent margin (hours)",
+            "float",
+            "Set the time added to the arrival of the incumbent route before dropping "
+            "the points that cannot beat it",
+            default=1.0,
+            lower=0.0,
+            upper=24.0,
+            step=0.1,
+            digits=1,
+        ),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.incumbent: Optional[List[IsoPoint]] = None
+
+    def set_incumbent(self, path) -> None:
+        """Sets the path (list of IsoPoint) of a completed route the isochrone points
+        have to beat; None removes it"""
+        self.incumbent = list(path) if path else None
+
+    def get_incumbent_arrival(self, nextwp, since=None) -> Optional[datetime.datetime]:
+        """Returns the arrival time of the incumbent at nextwp: the time of its point
+        nearest to nextwp plus the rest of the way sailed at the speed of that point,
+        the same way the arrival of the routers is measured; if since is set, only the
+        points not before it (the ones of the current leg) are searched"""
+        if self.incumbent is None:
+            return None
+
+        # IsoPoint.time holds a datetime
+        points: List[Any] = [
+            p
+            for p in self.incumbent
+            if p.time is not None and (since is None or p.time >= since)
+        ]
+        if len(points) == 0:
+            return None
+
+        distances = self.get_geodesy().point_distance_many(
+            nextwp[0],
+            nextwp[1],
+            np.array([p.pos[0] for p in points]),
+            np.array([p.pos[1] for p in points]),
+        )
+        i = int(np.argmin(distances))
+        p = points[i]
+        hours = float(distances[i]) / p.speed if p.speed > 0 else 0.0
+        return p.time + datetime.timedelta(hours=hours)
+
+    def get_tws_max_speed(self, min_tws, max_tws) -> float:
+        """Returns the maximum boat speed (knots) of the polar for a tws (knots)
+        between min_tws and max_tws: the polar is linear between its tws columns, so
+        it is reached at a bound or at a column in between"""
+        tws = [min_tws, max_tws]
+        tws += [float(t) for t in self.polar.tws if min_tws < t < max_tws]
+        return max(self.polar.get_reaching(t)[0] for t in tws)
+
+    def get_forecast_max_speed(self, times, lats, lons) -> Optional[float]:
+        """Returns the maximum boat speed (knots) of the polar over the tws range of the
+        grib at the given times, sampled on a FORECAST_GRID grid over the bounding box
+        of the given positions; None if the grib has no wind there"""
+        grid_lats = np.linspace(min(lats), max(lats), FORECAST_GRID).tolist()
+        grid_lons = np.linspace(min(lons), max(lons), FORECAST_GRID).tolist()
+        tws = []
+        for t in times:
+            for lat in grid_lats:
+                for lon in grid_lons:
+                    try:
+                        wind = self.grib.get_wind_at(t, lat, lon)
+                    except Exception:
+                        continue
+                    if wind is not None:
+                        tws.append(wind[1] * utils.MS2KT)
+        if len(tws) == 0:
+            return None
+        return self.get_tws_max_speed(min(tws), max(tws))
+
+    def _prune(self, iso, nextwp, isocrone) -> Isochrone:
+        if len(iso) == 0 or iso.time is None:
+            return iso
+        arrival = self.get_incumbent_arrival(nextwp, isocrone[0].time)
+        if arrival is None:
+            return iso
+
+        margin = self.get_param_value("incumbent_margin")
+        left = (arrival - iso.time).total_seconds() / 3600.0 + margin
+
+        # the forecast is sampled at the step times until the arrival of the
+        # incumbent, on the area between the isochrone and the waypoint; the tws met
+        # by the step are part of the range too
+        step = (iso.time - isocrone[-1].time).total_seconds() / 3600.0
+        count = int(max(left, 0.0) / step) + 1 if step > 0 else 1
+        offsets = np.linspace(0, count - 1, min(count, FORECAST_TIMES)).round()
+        times = [
+            iso.time + datetime.timedelta(hours=k * step)
+            for k in np.unique(offsets).tolist()
+        ]
+        vmax = self.get_forecast_max_speed(
+            times,
+            iso.lat.tolist() + [nextwp[0]],
+            iso.lon.tolist() + [nextwp[1]],
+        )
+        if vmax is None:
+            vmax = self.get_max_speed()
+        else:
+            vmax = max(
+                vmax, self.get_tws_max_speed(float(iso.tws.min()), float(iso.tws.max()))
+            )
+        if vmax <= 0:
+            return iso
+
+        hopeful = iso.next_wp_dist / vmax <= left
+        # the incumbent only bounds the search: it never empties an isochrone
+        if not hopeful.any():
+            return iso
+        return iso.take(hopeful)
@@ -18,8 +18,10 @@
 import datetime
 from typing import List
 
+import numpy as np
+
 from .. import utils
-from .router import IsoPoint, Router, RouterParam, RoutingResult
+from .router import Isochrone, IsoPoint, Router, RouterParam, RoutingResult
 
 
 class LinearBestIsoRouter(Router):
@@ -38,9 +40,23 @@ class LinearBestIsoRouter(Router):
         ),
     }
 
+    def _distances_to(self, iso, end) -> np.ndarray:
+        """Returns the distances (nm) from every point of iso to end; they are the
+        next_wp_dist computed with the isochrone if end is its target"""
+        if iso.target == tuple(end):
+            return iso.next_wp_dist
+        return self.get_geodesy().point_distance_many(end[0], end[1], iso.lat, iso.lon)
+
+    def _nearest_to(self, iso, end) -> int:
+        """Returns the index of the point of iso nearest to end"""
+        if iso.target == tuple(end):
+            return iso.nearest_index()
+        return int(np.argmin(self._distances_to(iso, end)))
+
     def _route(self, lastlog, time, timedelta, start, end, iso_f):  # noqa: C901
         position = start
         path = []
+        geodesy = self.get_geodesy()
 
         def generate_path(p):
             nonlocal path
@@ -63,46 +79,51 @@ class LinearBestIsoRouter(Router):
                     end,
                 )
             else:
-                nwdist = utils.point_distance(end[0], end[1], start[0], start[1])
+                nwdist = geodesy.point_distance(end[0], end[1], start[0], start[1])
                 isoc = iso_f(
                     time + datetime.timedelta(hours=timedelta),
                     timedelta,
-                    [[IsoPoint((start[0], start[1]), time=time, next_wp_dist=nwdist)]],
+                    [
+                        Isochrone.from_points(
+                            [
+                                IsoPoint(
+                                    (start[0], start[1]), time=time, next_wp_dist=nwdist
+                                )
+                            ]
+                        )
+                    ],
                     end,
                 )
 
-            nearest_dist = self.get_param_value("min_increase")
-            nearest_solution = None
-            for p in isoc[-1]:
-                distance_to_end_point = p.point_distance(end)
-                if distance_to_end_point < self.get_param_value("min_increase"):
+            # Try the points in range, nearest first; the first one able to reach the
+            # waypoint is the nearest solution (the reach is the one of a step, at most
+            # an hour, so long steps do not arrive far from the waypoint)
+            distances = self._distances_to(isoc[-1], end)
+            candidates = np.flatnonzero(distances < self.get_param_value("min_increase"))
+            candidates = candidates[np.argsort(distances[candidates], kind="stable")]
+            max_reach_distances = utils.max_reach_distance_many(
+                isoc[-1].speed[candidates], min(1.0, timedelta)
+            )
+            reaching = distances[candidates] < max_reach_distances * 1.1
+            candidates = candidates[reaching]
+
+            if len(candidates) > 0 and (
+                not self.point_validity or self.point_validity(end[0], end[1])
+            ):
+                for i in candidates.tolist():
+                    p = isoc[-1][i]
                     # (twd,tws) = self.grib.get_wind_at (time + datetime.timedelta(hours=timedelta),
                     # p.pos[0], p.pos[1])
-                    max_reach_distance = utils.max_reach_distance(p.pos, p.speed)
-                    if distance_to_end_point < abs(max_reach_distance * 1.1):
-                        if (
-                            not self.point_validity
-                            or self.point_validity(end[0], end[1])
-                        ) and (
-                            not self.line_validity
-                            or self.line_validity(end[0], end[1], p.pos[0], p.pos[1])
-                        ):
-                            if distance_to_end_point < nearest_dist:
-                                nearest_dist = distance_to_end_point
-                                nearest_solution = p
-            if nearest_solution:
-                generate_path(nearest_solution)
+                    if not self.line_validity or self.line_validity(
+                        end[0], end[1], p.pos[0], p.pos[1]
+                    ):
+                        generate_path(p)
+                        break
 
         # out of grib scope
         else:
-            min_dist = 1000000
             isoc = lastlog.isochrones
-            for p in isoc[-1]:
-                check_dist = p.point_distance(end)
-                if check_dist < min_dist:
-                    min_dist = check_dist
-                    min_p = p
-            generate_path(min_p)
+            generate_path(isoc[-1][self._nearest_to(isoc[-1], end)])
 
         return RoutingResult(
             time=time + datetime.timedelta(hours=timedelta),
@@ -122,14 +143,8 @@ class LinearBestIsoRouter(Router):
                 path.append(iso[path[-1].prev_idx])
             path = path[::-1]
 
-        min_dist = 1000000
         isoc = lastlog.isochrones
-        for p in isoc[-1]:
-            check_dist = p.point_distance(end)
-            if check_dist < min_dist:
-                min_dist = check_dist
-                min_p = p
-        generate_path(min_p)
+        generate_path(isoc[-1][self._nearest_to(isoc[-1], end)])
 
         return path
 
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import heapq
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .. import utils
+from ..geodesy import get_geodesy
+from .router import (
+    IsoPoint,
+    Router,
+    RouterParam,
+    RoutingNoPathError,
+    RoutingNoWindError,
+    RoutingResult,
+)
+
+# Grid steps (dlat, dlon) of the mesh edges: the 8 neighbours plus the knight moves,
+# giving 16 headings
+MESH_STEPS = [
+    (0, 1),
+    (1, 1),
+    (1, 0),
+    (1, -1),
+    (1, 2),
+    (2, 1),
+    (2, -1),
+    (1, -2),
+]
+MESH_STEPS = MESH_STEPS + [(-di, -dj) for di, dj in MESH_STEPS]
+
+
+def _validate_lines(lines, line_validity=None, lines_validity=None) -> np.ndarray:
+    """Returns the validity mask of the (lat1, lon1, lat2, lon2) lines"""
+    valid = np.ones(len(lines), dtype=bool)
+    if line_validity:
+        valid[:] = [line_validity(*line) for line in lines]
+    if lines_validity and len(lines) > 0:
+        idx = np.flatnonzero(valid)
+        valid[idx] = np.asarray(
+            lines_validity([list(lines[x]) for x in idx.tolist()]), dtype=bool
+        )
+    return valid
+
+
+class Mesh:
+    """
+    Mesh is a regular lat / lon grid of nodes linked to their neighbours by edges;
+    node and edge validity is checked once when the mesh is built, so the same mesh
+    can be reused by all the routings over the same sea area
+    """
+
+    def __init__(
+        self,
+        bbox: Tuple[float, float, float, float],
+        resolution: float,
+        point_validity=None,
+        line_validity=None,
+        points_validity=None,
+        lines_validity=None,
+        geodesy="spherical",
+    ):
+        """
+        Parameters
+        ----------
+        bbox : (float, float, float, float)
+                The (lat_min, lon_min, lat_max, lon_max) of the mesh area
+        resolution : float
+                Distance in degrees between two nodes
+        point_validity : function(lat, lon)
+                Optional, default to None
+                Validity function of the nodes
+        line_validity : function(lat1, lon1, lat2, lon2)
+                Optional, default to None
+                Validity function of the edges
+        points_validity : function (latlons)
+                Optional, default to None
+                Batch validity function of the nodes
+        lines_validity : function(latlons)
+                Optional, default to None
+                Batch validity function of the edges
+        geodesy : string or Geodesy
+                Optional, default to "spherical"
+                Geodesy used for the edges length and bearing
+        """
+        self.resolution = resolution
+        self.line_validity = line_validity
+        self.lines_validity = lines_validity
+        self.geodesy = get_geodesy(geodesy)
+
+        self.nlat = int(round((bbox[2] - bbox[0]) / resolution)) + 1
+        self.nlon = int(round((bbox[3] - bbox[1]) / resolution)) + 1
+        self.lat0 = bbox[0]
+        self.lon0 = bbox[1]
+        ii, jj = np.meshgrid(np.arange(self.nlat), np.arange(self.nlon), indexing="ij")
+        self.lat = (self.lat0 + ii * resolution).reshape(-1)
+        self.lon = (self.lon0 + jj * resolution).reshape(-1)
+
+        valid = np.ones(len(self.lat), dtype=bool)
+        if point_validity:
+            valid[:] = [
+                point_validity(a, b)
+                for a, b in zip(self.lat.tolist(), self.lon.tolist())
+            ]
+        if points_validity:
+            idx = np.flatnonzero(valid)
+            valid[idx] = np.asarray(
+                points_validity(
+                    list(zip(self.lat[idx].tolist(), self.lon[idx].tolist()))
+                ),
+                dtype=bool,
+            )
+        self.valid = valid
+
+        # Every undirected edge is validated once, then added in both directions
+        src_list = []
+        dst_list = []
+        for di, dj in MESH_STEPS[: len(MESH_STEPS) // 2]:
+            i2 = ii + di
+            j2 = jj + dj
+            inside = (i2 >= 0) & (i2 < self.nlat) & (j2 >= 0) & (j2 < self.nlon)
+            src = (ii * self.nlon + jj)[inside]
+            dst = (i2 * self.nlon + j2)[inside]
+            keep = valid[src] & valid[dst]
+            src_list.append(src[keep])
+            dst_list.append(dst[keep])
+        src = np.concatenate(src_list)
+        dst = np.concatenate(dst_list)
+
+        lines = np.column_stack(
+            (self.lat[src], self.lon[src], self.lat[dst], self.lon[dst])
+        ).tolist()
+        keep = _validate_lines(lines, line_validity, lines_validity)
+        src, dst = src[keep], dst[keep]
+        src, dst = np.concatenate((src, dst)), np.concatenate((dst, src))
+
+        order = np.argsort(src, kind="stable")
+        src = src[order]
+        self.dst = dst[order]
+        self.offsets = np.searchsorted(src, np.arange(len(self.lat) + 1))
+        self.distance = self.geodesy.point_distance_many(
+            self.lat[src], self.lon[src], self.lat[self.dst], self.lon[self.dst]
+        )
+        self.brg = self.geodesy.lossodromic_many(
+            self.lat[src], self.lon[src], self.lat[self.dst], self.lon[self.dst]
+        )[1]
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def contains(self, lat: float, lon: float) -> bool:
+        """Returns True if the point is inside the mesh area"""
+        i = (lat - self.lat0) / self.resolution
+        j = (lon - self.lon0) / self.resolution
+        return 0 <= i <= self.nlat - 1 and 0 <= j <= self.nlon - 1
+
+    def link(self, lat: float, lon: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the (nodes, distances in nm, bearings from the point) of the valid
+        nodes of the 4x4 block around a point that can be reached from it in a
+        straight line"""
+        i = int(math.floor((lat - self.lat0) / self.resolution))
+        j = int(math.floor((lon - self.lon0) / self.resolution))
+        ii, jj = np.meshgrid(
+            np.arange(max(i - 1, 0), min(i + 3, self.nlat)),
+            np.arange(max(j - 1, 0), min(j + 3, self.nlon)),
+            indexing="ij",
+        )
+        nodes = (ii * self.nlon + jj).reshape(-1)
+        nodes = nodes[self.valid[nodes]]
+
+        lines = [
+            (lat, lon, a, b)
+            for a, b in zip(self.lat[nodes].tolist(), self.lon[nodes].tolist())
+        ]
+        nodes = nodes[_validate_lines(lines, self.line_validity, self.lines_validity)]
+        distance = self.geodesy.point_distance_many(
+            lat, lon, self.lat[nodes], self.lon[nodes]
+        )
+        # a node on the point is skipped, its neighbours are linked anyway
+        nodes, distance = nodes[distance > 1e-9], distance[distance > 1e-9]
+        _, brg = self.geodesy.lossodromic_many(
+            lat, lon, self.lat[nodes], self.lon[nodes]
+        )
+        return nodes, distance, brg
+
+
+class MeshRouter(Router):
+    """
+    MeshRouter computes the earliest arrival route over a Mesh with a time dependent
+    Dijkstra: the time to sail an edge is its length over the polar speed for the wind
+    at its origin node when it is reached; the whole leg is solved on the first step.
+    Meshes are cached by area, resolution and validity functions, so routings over
+    the same sea area share them, and a cached mesh is reused for the legs inside its
+    area; a prebuilt mesh can also be set with set_mesh
+    """
+
+    PARAMS = {
+        "geodesy": Router.PARAMS["geodesy"],
+        "mesh_resolution": RouterParam(
+            "mesh_resolution",
+            "Mesh resolution (degrees)",
+            "float",
+            "Set the distance between the mesh nodes",
+            default=0.1,
+            lower=0.01,
+            upper=2.0,
+            step=0.01,
+            digits=2,
+        ),
+        "mesh_margin": RouterParam(
+            "mesh_margin",
+            "Mesh margin (degrees)",
+            "float",
+            "Set the margin of the mesh area around the start and the waypoint",
+            default=0.5,
+            lower=0.0,
+            upper=20.0,
+            step=0.1,
+            digits=1,
+        ),
+    }
+
+    meshes = utils.LRUCache(8)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mesh: Optional[Mesh] = None
+        self._last_path: List[IsoPoint] = []
+
+    def set_mesh(self, mesh: Optional[Mesh]) -> None:
+        """Sets the mesh used for routing (None to build one around each leg)"""
+        self.mesh = mesh
+
+    def get_mesh(self, start, end) -> Mesh:
+        """Returns the mesh covering start and end"""
+        if (
+            self.mesh is not None
+            and self.mesh.contains(*start)
+            and self.mesh.contains(*end)
+        ):
+            return self.mesh
+
+        res = self.get_param_value("mesh_resolution")
+        margin = self.get_param_value("mesh_margin")
+        area = (
+            math.floor((min(start[0], end[0]) - margin) / res),
+            math.floor((min(start[1], end[1]) - margin) / res),
+            math.ceil((max(start[0], end[0]) + margin) / res),
+            math.ceil((max(start[1], end[1]) + margin) / res),
+        )
+        key = (
+            area,
+            res,
+            self.get_param_value("geodesy"),
+            self.point_validity,
+            self.line_validity,
+            self.points_validity,
+            self.lines_validity,
+        )
+        mesh = self.meshes.get(key)
+        if mesh is None:
+            # a cached mesh of a wider area, built for another track, fits as well
+            mesh = self._get_wider_mesh(key)
+        if mesh is None:
+            mesh = Mesh(
+                (area[0] * res, area[1] * res, area[2] * res, area[3] * res),
+                res,
+                self.point_validity,
+                self.line_validity,
+                self.points_validity,
+                self.lines_validity,
+                self.get_param_value("geodesy"),
+            )
+            self.meshes.put(key, mesh)
+        return mesh
+
+    def _get_wider_mesh(self, key) -> Optional[Mesh]:
+        """Returns the smallest cached mesh with the settings of key whose area
+        contains the one of key, or None"""
+        area = key[0]
+        wider = [
+            (k, mesh)
+            for k, mesh in self.meshes.items()
+            if k[1:] == key[1:]
+            and k[0][0] <= area[0]
+            and k[0][1] <= area[1]
+            and k[0][2] >= area[2]
+            and k[0][3] >= area[3]
+        ]
+        if not wider:
+            return None
+        k, mesh = min(wider, key=lambda item: len(item[1]))
+        # marks it as recently used
+        self.meshes.get(k)
+        return mesh
+
+    def _edge_speeds(self, t, lat, lon, brg) -> Tuple[float, float, np.ndarray]:
+        """Returns (twd in radians, tws in knots, speeds) for the edges leaving the point
+        lat, lon at time t on the brg bearings"""
+        try:
+            wind = self.grib.get_wind_at(t, lat, lon)
+        except Exception as e:
+            raise RoutingNoWindError() from e
+        if wind is None:
+            return (0.0, 0.0, np.zeros(len(brg)))
+        twd = math.radians(wind[0])
+        tws = wind[1] * utils.MS2KT
+        twa = np.abs((brg - twd + math.pi) % (2 * math.pi) - math.pi)
+        return (twd, tws, self.polar.get_speed(tws, twa))
+
+    def _solve(self, t, start, end) -> List[IsoPoint]:  # noqa: C901
+        """Returns the earliest arrival path from start to end leaving at t"""
+        mesh = self.get_mesh(start, end)
+        n = len(mesh)
+        s_node, e_node = n, n + 1
+        s_nodes, s_distance, s_brg = mesh.link(start[0], start[1])
+        e_nodes, e_distance, e_brg = mesh.link(end[0], end[1])
+        # the edges toward the waypoint have the opposite bearing of the ones from it
+        e_brg = e_brg + math.pi
+        to_end = np.full(n, -1, dtype=np.intp)
+        to_end[e_nodes] = np.arange(len(e_nodes))
+
+        geodesy = mesh.geodesy
+        # start and end close enough are also linked directly
+        direct = geodesy.point_distance(start[0], start[1], end[0], end[1])
+        direct_valid = (
+            direct <= 2 * mesh.resolution * 60
+            and _validate_lines(
+                [(end[0], end[1], start[0], start[1])],
+                self.line_validity,
+                self.lines_validity,
+            )[0]
+        )
+
+        hours = np.full(n + 2, np.inf)
+        prev = np.full(n + 2, -1, dtype=np.intp)
+        leg = np.zeros((n + 2, 4))
+        hours[s_node] = 0.0
+        done = np.zeros(n + 2, dtype=bool)
+        heap = [(0.0, s_node)]
+
+        while heap:
+            h, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if u == e_node:
+                break
+
+            if u == s_node:
+                lat, lon = start
+                dst, distance, brg = s_nodes, s_distance, s_brg
+                if direct_valid:
+                    dst = np.append(dst, e_node)
+                    distance = np.append(distance, direct)
+                    brg = np.append(brg, geodesy.lossodromic(*start, *end)[1])
+            else:
+                lat, lon = mesh.lat[u], mesh.lon[u]
+                a, b = mesh.offsets[u], mesh.offsets[u + 1]
+                dst, distance, brg = mesh.dst[a:b], mesh.distance[a:b], mesh.brg[a:b]
+                if to_end[u] >= 0:
+                    k = to_end[u]
+                    dst = np.append(dst, e_node)
+                    distance = np.append(distance, e_distance[k])
+                    brg = np.append(brg, e_brg[k])
+
+            twd, tws, speed = self._edge_speeds(
+                t + datetime.timedelta(hours=h), float(lat), float(lon), brg
+            )
+            with np.errstate(divide="ignore"):
+                arrival = h + np.where(speed > 0, distance / speed, np.inf)
+            better = arrival < hours[dst]
+            for v, arr, sp, bg in zip(
+                dst[better].tolist(),
+                arrival[better].tolist(),
+                speed[better].tolist(),
+                brg[better].tolist(),
+            ):
+                hours[v] = arr
+                prev[v] = u
+                leg[v] = (twd, tws, sp, bg)
+                heapq.heappush(heap, (arr, v))
+
+        if not done[e_node]:
+            raise RoutingNoPathError()
+
+        nodes = [e_node]
+        while nodes[-1] != s_node:
+            nodes.append(int(prev[nodes[-1]]))
+        nodes.reverse()
+
+        path = []
+        for i, v in enumerate(nodes):
+            if v == s_node:
+                pos = (start[0], start[1])
+            elif v == e_node:
+                pos = (end[0], end[1])
+            else:
+                pos = (float(mesh.lat[v]), float(mesh.lon[v]))
+            twd, tws, speed, brg = leg[v].tolist()
+            path.append(
+                IsoPoint(
+                    pos,
+                    i - 1,
+                    t + datetime.timedelta(hours=float(hours[v])),
+                    twd,
+                    tws,
+                    speed,
+                    math.degrees(utils.reduce360(brg)),
+                    geodesy.point_distance(pos[0], pos[1], end[0], end[1]),
+                    geodesy.lossodromic(start[0], start[1], pos[0], pos[1]),
+                )
+            )
+        return path
+
+    def route(self, lastlog, t, timedelta, start, end) -> RoutingResult:
+        path = self._solve(t, start, end)
+        self._last_path = path
+        return RoutingResult(
+            time=path[-1].time,
+            path=path,
+            position=path[-1].pos,
+            isochrones=[],
+        )
+
+    def get_current_best_path(self, lastlog, end) -> List:
+        return list(self._last_path)
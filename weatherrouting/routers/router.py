@@ -15,12 +15,17 @@
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
 
+import copy
 import math
-from concurrent.futures import ThreadPoolExecutor
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
 
 from .. import utils
+from ..geodesy import GEODESY_BACKENDS, Geodesy, get_geodesy
 
 # http://www.tecepe.com.br/nav/vrtool/routing.htm
 
@@ -44,6 +49,7 @@ class RouterParam:
         upper=None,
         step=None,
         digits=None,
+        choices=None,
     ):
         self.code = code
         self.name = name
@@ -56,12 +62,17 @@ class RouterParam:
         self.upper = upper
         self.digits = digits
         self.step = step
+        self.choices = choices
 
 
 class RoutingNoWindError(Exception):
     pass
 
 
+class RoutingNoPathError(Exception):
+    pass
+
+
 class RoutingResult:
     def __init__(self, time, path=[], isochrones=[], position=None, progress=0):
         self.time = time
@@ -125,6 +136,394 @@ class IsoPoint:
         return utils.point_distance(to[0], to[1], self.pos[0], self.pos[1])
 
 
+class Isochrone:
+    """
+    Array backed isochrone: every point attribute is stored in a numpy array, in place
+    of a list of IsoPoint objects; indexing and iterating return IsoPoint views
+    """
+
+    FIELDS = (
+        "lat",
+        "lon",
+        "twd",
+        "tws",
+        "speed",
+        "brg",
+        "next_wp_dist",
+        "los_dist",
+        "los_brg",
+    )
+    __slots__ = FIELDS + ("time", "prev_idx", "dropped", "target", "_nearest")
+
+    lat: np.ndarray
+    lon: np.ndarray
+    twd: np.ndarray
+    tws: np.ndarray
+    speed: np.ndarray
+    brg: np.ndarray
+    next_wp_dist: np.ndarray
+    los_dist: np.ndarray
+    los_brg: np.ndarray
+    prev_idx: np.ndarray
+
+    def __init__(self, time=None, prev_idx=None, **fields):
+        """
+        Parameters
+        ----------
+        time : datetime
+                Time of the isochrone points
+        prev_idx : array of int
+                Index of the originating point in the previous isochrone
+        fields : arrays of float
+                The lat, lon, twd, tws, speed, brg, next_wp_dist, los_dist and los_brg
+                arrays (missing ones are filled with zeros)
+        """
+        self.time = time
+        n = len(fields["lat"]) if "lat" in fields else 0
+        for f in self.FIELDS:
+            setattr(self, f, np.asarray(fields.get(f, np.zeros(n)), dtype=np.float64))
+        if prev_idx is None:
+            prev_idx = np.full(n, -1)
+        self.prev_idx = np.asarray(prev_idx, dtype=np.intp)
+        # number of points dropped by the max_points cap
+        self.dropped = 0
+        # the waypoint next_wp_dist refers to
+        self.target = None
+        self._nearest = None
+
+    @staticmethod
+    def from_points(points, time=None) -> "Isochrone":
+        """Returns an Isochrone holding the given IsoPoint list"""
+        if time is None and len(points) > 0:
+            time = points[0].time
+        return Isochrone(
+            time=time,
+            prev_idx=[p.prev_idx for p in points],
+            lat=[p.pos[0] for p in points],
+            lon=[p.pos[1] for p in points],
+            twd=[p.twd for p in points],
+            tws=[p.tws for p in points],
+            speed=[p.speed for p in points],
+            brg=[p.brg for p in points],
+            next_wp_dist=[p.next_wp_dist for p in points],
+            los_dist=[p.start_wp_los[0] for p in points],
+            los_brg=[p.start_wp_los[1] for p in points],
+        )
+
+    @staticmethod
+    def concatenate(isos, time=None) -> "Isochrone":
+        """Returns an Isochrone holding the points of all the given isochrones"""
+        return Isochrone(
+            time=time,
+            prev_idx=np.concatenate([iso.prev_idx for iso in isos]),
+            **{
+                f: np.concatenate([getattr(iso, f) for iso in isos])
+                for f in Isochrone.FIELDS
+            },
+        )
+
+    def take(self, idx) -> "Isochrone":
+        """Returns a new Isochrone with the points selected by idx (an index array
+        or a boolean mask)"""
+        return Isochrone(
+            time=self.time,
+            prev_idx=self.prev_idx[idx],
+            **{f: getattr(self, f)[idx] for f in self.FIELDS},
+        )
+
+    def nearest_index(self) -> int:
+        """Returns the index of the point nearest to the target waypoint, ie with the
+        smallest next_wp_dist (computed once)"""
+        if self._nearest is None:
+            self._nearest = int(np.argmin(self.next_wp_dist))
+        return self._nearest
+
+    def positions(self) -> np.ndarray:
+        """Returns the (n, 2) array of point positions (lat, lon)"""
+        return np.column_stack((self.lat, self.lon))
+
+    def to_points(self) -> List[IsoPoint]:
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def __getitem__(self, i) -> IsoPoint:
+        return IsoPoint(
+            (float(self.lat[i]), float(self.lon[i])),
+            int(self.prev_idx[i]),
+            self.time,
+            float(self.twd[i]),
+            float(self.tws[i]),
+            float(self.speed[i]),
+            float(self.brg[i]),
+            float(self.next_wp_dist[i]),
+            (float(self.los_dist[i]), float(self.los_brg[i])),
+        )
+
+    def __iter__(self) -> Iterator[IsoPoint]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class PolarPointFunction:
+    """Moves a point following the boat polar; being a plain object in place of a
+    closure it can be sent to worker processes"""
+
+    def __init__(self, polar, geodesy):
+        self.polar = polar
+        self.geodesy = geodesy
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, PolarPointFunction)
+            and other.polar is self.polar
+            and other.geodesy is self.geodesy
+        )
+
+    def __call__(self, p, tws, twa, dt, brg):
+        speed = self.polar.get_speed(tws, math.copysign(twa, 1))
+        # Issue 19 : for routage_point_distance defaut distance unit is nm
+        #  speed*dt is nm  (don't convert in km)
+        return (self.geodesy.routage_point_distance(p[0], p[1], speed * dt, brg), speed)
+
+    def move(self, tws, twa, dt):
+        """Returns the arrays of (distance in nm, speed) for the tws and twa arrays"""
+        speed = self.polar.get_speed(tws, np.abs(twa))
+        return (speed * dt, speed)
+
+
+class FixedSpeedPointFunction:
+    """Moves a point at a fixed speed in knots (motoring)"""
+
+    def __init__(self, fixed_speed, geodesy):
+        self.fixed_speed = fixed_speed
+        self.geodesy = geodesy
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, FixedSpeedPointFunction)
+            and other.fixed_speed == self.fixed_speed
+            and other.geodesy is self.geodesy
+        )
+
+    def __call__(self, p, tws, twa, dt, brg):
+        # TODO: add current factor
+        speed = self.fixed_speed
+        return (
+            self.geodesy.routage_point_distance(
+                p[0], p[1], speed * dt * utils.NAUTICAL_MILE_IN_KM, brg
+            ),
+            speed,
+        )
+
+    def move(self, tws, twa, dt):
+        speed = np.full(np.broadcast(tws, twa).shape, float(self.fixed_speed))
+        return (speed * dt * utils.NAUTICAL_MILE_IN_KM, speed)
+
+
+# twa of the fixed 5 degrees heading sweep
+HEADINGS_SWEEP = [math.radians(twa) for twa in range(-180, 180, 5)]
+
+
+def reduce_pi(alfa):
+    """Reduces the angle (or array of angles) alfa to -pi..pi"""
+    return (np.asarray(alfa) + math.pi) % (2 * math.pi) - math.pi
+
+
+class HeadingSampler:
+    """
+    Samples budget headings for the expansion of a point, in place of the fixed 5
+    degrees sweep: half of them are spread over the half plane making progress toward
+    the next waypoint (headings more than 90 degrees off are skipped), the others are
+    packed around the focus angles: the waypoint direction and, if a polar is given,
+    the best VMG angles toward the waypoint, upwind and downwind
+    """
+
+    DENSE_STEP = math.radians(2.5)
+
+    def __init__(self, budget, geodesy, polar=None):
+        self.budget = budget
+        self.geodesy = geodesy
+        self.polar = polar
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, HeadingSampler)
+            and other.budget == self.budget
+            and other.geodesy is self.geodesy
+            and other.polar is self.polar
+        )
+
+    def __call__(self, pos, twd, tws, nextwp) -> np.ndarray:
+        """Returns the twa (radians) to expand for a point at pos with wind twd
+        (radians) and tws (knots)"""
+        brg = self.geodesy.lossodromic(pos[0], pos[1], nextwp[0], nextwp[1])[1]
+        twa_wp = float(reduce_pi(brg - twd))
+
+        focus = [twa_wp]
+        if self.polar is not None:
+            vmg_twa = self.polar.get_max_vmgtwa(tws, abs(twa_wp))[1]
+            up = self.polar.get_max_vmg_up(tws)[1]
+            down = self.polar.get_max_vmg_down(tws)[1]
+            for a in (math.copysign(vmg_twa, twa_wp), up, -up, down, -down):
+                if abs(reduce_pi(a - twa_wp)) <= math.pi / 2 and all(
+                    abs(reduce_pi(a - f)) > self.DENSE_STEP for f in focus
+                ):
+                    focus.append(a)
+
+        n_sparse = self.budget // 2
+        sparse = twa_wp + np.linspace(-math.pi / 2, math.pi / 2, n_sparse + 2)[1:-1]
+
+        k, f = np.divmod(np.arange(self.budget - n_sparse), len(focus))
+        offsets = (k + 1) // 2 * np.where(k % 2 == 1, 1.0, -1.0) * self.DENSE_STEP
+        dense = reduce_pi(np.asarray(focus)[f] + offsets - twa_wp)
+        dense = twa_wp + np.clip(dense, -math.pi / 2, math.pi / 2)
+
+        return reduce_pi(np.concatenate((dense, sparse)))
+
+
+# relative margin of the early rejection test, covering the difference between the
+# spherical prediction and the geodesy backends
+EARLY_REJECTION_MARGIN = 0.02
+
+
+def predict_wp_dist(next_wp_dist, distance, off):
+    """Returns the distance to the waypoint after sailing distance (nm) from a point
+    next_wp_dist (nm) away from it, on a heading off radians from the bearing to the
+    waypoint; it solves the spherical triangle with the law of cosines, so it costs a
+    few flops in place of a destination point and a distance"""
+    radius = utils.km2nm(utils.SPHERE_RADIUS)
+    a = np.asarray(next_wp_dist) / radius
+    b = np.asarray(distance) / radius
+    cos_c = np.cos(a) * np.cos(b) + np.sin(a) * np.sin(b) * np.cos(off)
+    return np.arccos(np.clip(cos_c, -1.0, 1.0)) * radius
+
+
+def early_rejection_mask(next_wp_dist, distance, off):
+    """Returns the mask of the candidates that surely do not get closer to the
+    waypoint, and can be rejected before any geodesy calculation"""
+    predicted = predict_wp_dist(next_wp_dist, distance, off)
+    return predicted > np.asarray(next_wp_dist) * (1 + EARLY_REJECTION_MARGIN)
+
+
+def corridor_distance(lats, lons, route) -> np.ndarray:
+    """Returns the distance (nm) of every point to the route polyline (a (n, 2)
+    array of lat, lon), on the local equirectangular projection of each point"""
+    lats = np.asarray(lats, dtype=np.float64)[:, None]
+    lons = np.asarray(lons, dtype=np.float64)[:, None]
+    scale = np.cos(np.radians(lats))
+    if len(route) == 1:
+        route = np.concatenate((route, route))
+    ax = (route[:-1, 1] - lons) * scale
+    ay = route[:-1, 0] - lats
+    bx = (route[1:, 1] - lons) * scale
+    by = route[1:, 0] - lats
+    dx = bx - ax
+    dy = by - ay
+    length = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        k = np.clip(np.where(length > 0, -(ax * dx + ay * dy) / length, 0.0), 0.0, 1.0)
+    return np.min(np.hypot(ax + k * dx, ay + k * dy), axis=1) * 60.0
+
+
+def _expand_points(  # noqa: C901
+    grib, point_f, geodesy, t, dt, start, nextwp, last, offset=0, headings_f=None
+) -> Isochrone:
+    """Calculates the candidate points reached from every point of last (an
+    Isochrone, or a slice of it starting at offset) sailing the 72 headings, or the
+    ones returned by headings_f(pos, twd, tws, nextwp); it is a module function so it
+    can run in a worker process"""
+    cols: Dict[str, List[float]] = {f: [] for f in Isochrone.FIELDS}
+    prev_idx = []
+
+    for i in range(len(last)):
+        p = last[i]
+        try:
+            (twd, tws) = grib.get_wind_at(t, p.pos[0], p.pos[1])
+        except Exception as e:
+            raise RoutingNoWindError() from e
+
+        twd = math.radians(twd)
+        tws = utils.ms_to_knots(tws)
+
+        if headings_f is not None:
+            twas = headings_f(p.pos, twd, tws, nextwp).tolist()
+        else:
+            twas = HEADINGS_SWEEP
+        brgs = [utils.reduce360(twd + twa) for twa in twas]
+
+        # Reject the candidates moving away from the waypoint before the geodesy
+        move_f = getattr(point_f, "move", None)
+        if move_f is not None:
+            wp_brg = geodesy.lossodromic(p.pos[0], p.pos[1], nextwp[0], nextwp[1])[1]
+            distances = move_f(tws, np.array(twas), dt)[0]
+            rejected = early_rejection_mask(
+                p.next_wp_dist, distances, np.array(brgs) - wp_brg
+            ).tolist()
+        else:
+            rejected = [False] * len(twas)
+
+        for twa, brg, reject in zip(twas, brgs, rejected):
+            if reject:
+                continue
+
+            # Calculate next point
+            ptoiso, speed = point_f(p.pos, tws, twa, dt, brg)
+
+            nextwpdist = geodesy.point_distance(
+                ptoiso[0], ptoiso[1], nextwp[0], nextwp[1]
+            )
+            if nextwpdist > p.next_wp_dist:
+                continue
+            startwplos = geodesy.lossodromic(start[0], start[1], ptoiso[0], ptoiso[1])
+
+            prev_idx.append(offset + i)
+            cols["lat"].append(ptoiso[0])
+            cols["lon"].append(ptoiso[1])
+            cols["twd"].append(twd)
+            cols["tws"].append(tws)
+            cols["speed"].append(speed)
+            cols["brg"].append(math.degrees(brg))
+            cols["next_wp_dist"].append(nextwpdist)
+            cols["los_dist"].append(startwplos[0])
+            cols["los_brg"].append(startwplos[1])
+
+    return Isochrone(time=t, prev_idx=prev_idx, **cols)
+
+
+def _first_min(group, values, mask=None) -> np.ndarray:
+    """Returns the mask of the points (among the ones selected by mask) holding the
+    minimum of values in their group (an array of non negative int)"""
+    if mask is None:
+        mask = np.ones(len(group), dtype=bool)
+    best = np.full(int(group.max()) + 1, np.inf)
+    np.minimum.at(best, group[mask], values[mask])
+    return mask & (values == best[group])
+
+
+def _expand_chunk(args) -> Isochrone:
+    return _expand_points(*args)
+
+
+# grib, point function and heading sampler of the router owning the worker process,
+# set once by the pool initializer so they are not sent with every chunk
+_worker_context: Tuple[Any, Any, Any] = (None, None, None)
+
+
+def _init_worker(grib, point_f, headings_f) -> None:
+    global _worker_context
+    _worker_context = (grib, point_f, headings_f)
+
+
+def _expand_worker_chunk(args) -> Isochrone:
+    grib, point_f, headings_f = _worker_context
+    geodesy, t, dt, start, nextwp, last, offset = args
+    return _expand_points(
+        grib, point_f, geodesy, t, dt, start, nextwp, last, offset, headings_f
+    )
+
+
 class Router:
     PARAMS: Dict[str, Any] = {
         "subdiv": RouterParam(
@@ -147,6 +546,110 @@ class Router:
             lower=False,
             upper=True,
         ),
+        "concurrent_mode": RouterParam(
+            "concurrent_mode",
+            "Concurrency mode",
+            "str",
+            "Run the concurrent calculation on threads or on processes (one chunk of "
+            "the isochrone per core; polar and grib must be picklable)",
+            default="thread",
+            choices=["thread", "process"],
+        ),
+        "geodesy": RouterParam(
+            "geodesy",
+            "Geodesy",
+            "str",
+            "Set the earth model: spherical (fast), flat (local flat earth, for short "
+            "coastal hops) or ellipsoidal (accurate)",
+            default="spherical",
+            choices=list(GEODESY_BACKENDS),
+        ),
+        "vectorized": RouterParam(
+            "vectorized",
+            "Vectorized calculation",
+            "bool",
+            "Expand all the isochrone points and headings in a single batched pass",
+            default=False,
+            lower=False,
+            upper=True,
+        ),
+        "corridor_width": RouterParam(
+            "corridor_width",
+            "Corridor width (nm)",
+            "float",
+            "Drop the isochrone points farther than this from the corridor route, if "
+            "one is set (0 to disable)",
+            default=0.0,
+            lower=0.0,
+            upper=500.0,
+            step=1.0,
+            digits=1,
+        ),
+        "dedup_tolerance": RouterParam(
+            "dedup_tolerance",
+            "Deduplication tolerance (nm)",
+            "float",
+            "Keep only the best isochrone point in each cell of this size (0 to "
+            "disable)",
+            default=0.0,
+            lower=0.0,
+            upper=5.0,
+            step=0.01,
+            digits=2,
+        ),
+        "envelope_pruning": RouterParam(
+            "envelope_pruning",
+            "Envelope pruning",
+            "bool",
+            "Drop the isochrone points lying in single point concave dents of the "
+            "frontier seen from the start",
+            default=False,
+            lower=False,
+            upper=True,
+        ),
+        "max_points": RouterParam(
+            "max_points",
+            "Maximum isochrone points",
+            "int",
+            "Downsample the isochrones exceeding this number of points, keeping the "
+            "angular spread and the most advanced points (0 for no limit)",
+            default=0,
+            lower=0,
+            upper=10000,
+            step=1,
+            digits=0,
+        ),
+        "compact_history": RouterParam(
+            "compact_history",
+            "Compact history",
+            "bool",
+            "Keep in the past isochrones only the points needed to rebuild the paths "
+            "to the last isochrone",
+            default=False,
+            lower=False,
+            upper=True,
+        ),
+        "adaptive_headings": RouterParam(
+            "adaptive_headings",
+            "Adaptive headings",
+            "bool",
+            "Sample the headings densely around the best VMG angles and the waypoint "
+            "direction, in place of the fixed 5 degrees sweep",
+            default=False,
+            lower=False,
+            upper=True,
+        ),
+        "heading_budget": RouterParam(
+            "heading_budget",
+            "Heading budget",
+            "int",
+            "Set the number of headings expanded per point with adaptive headings",
+            default=24,
+            lower=8,
+            upper=72,
+            step=1,
+            digits=0,
+        ),
     }
 
     def __init__(
@@ -157,19 +660,34 @@ class Router:
         line_validity=None,
         points_validity=None,
         lines_validity=None,
+        executor=None,
     ):
+        self.PARAMS = {k: copy.copy(v) for k, v in self.PARAMS.items()}
+        self.executor = executor
+        self._owned_executor = None
+        self._worker_context: Optional[Tuple[Any, Any, Any]] = None
         self.polar = polar
         self.grib = grib
         self.point_validity = point_validity
         self.line_validity = line_validity
         self.points_validity = points_validity
         self.lines_validity = lines_validity
+        self.corridor: Optional[np.ndarray] = None
+        self._max_speed: Optional[float] = None
 
         if self.points_validity:
             self.point_validity = None
         if self.lines_validity:
             self.line_validity = None
 
+    def set_corridor(self, positions) -> None:
+        """Sets the route (list of (lat, lon)) the isochrones are restricted around,
+        within corridor_width nm; None removes the corridor"""
+        if positions is None or len(positions) == 0:
+            self.corridor = None
+        else:
+            self.corridor = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+
     def set_param_value(self, code, value):
         if code not in self.PARAMS:
             raise Exception(f"Invalid param: {code}")
@@ -180,179 +698,374 @@ class Router:
             raise Exception(f"Invalid param: {code}")
         return self.PARAMS[code].value
 
-    def calculate_shortest_path_isochrones(self, fixed_speed, t, dt, isocrone, nextwp):
-        """Calculates isochrones based on shortest path at fixed speed in knots (motoring);
-        the speed considers reductions / increases derived from leeway"""
+    def get_executor(self, point_f=None, headings_f=None) -> Executor:
+        """Returns the executor used by the concurrent calculation: the one passed to
+        the constructor if any (shared, never shut down by the router), otherwise a
+        pool of the concurrent_mode kind owned by the router until close(); the
+        processes of an owned pool receive the grib, point_f and headings_f once, at
+        their start, and the pool is replaced when they change"""
+        if self.executor is not None:
+            return self.executor
 
-        def point_f(p, tws, twa, dt, brg):
-            # TODO: add current factor
-            speed = fixed_speed
-            return (
-                utils.routage_point_distance(
-                    p[0], p[1], speed * dt * utils.NAUTICAL_MILE_IN_KM, brg
-                ),
-                speed,
-            )
+        if self.get_param_value("concurrent_mode") == "process":
+            context = (self.grib, point_f, headings_f)
+            if not isinstance(self._owned_executor, ProcessPoolExecutor) or (
+                self._worker_context is None
+                or self._worker_context[0] is not self.grib
+                or self._worker_context[1:] != context[1:]
+            ):
+                self.close()
+                self._owned_executor = ProcessPoolExecutor(
+                    initializer=_init_worker, initargs=context
+                )
+                self._worker_context = context
+        elif not isinstance(self._owned_executor, ThreadPoolExecutor):
+            self.close()
+            self._owned_executor = ThreadPoolExecutor()
+        return self._owned_executor
 
-        return self._calculate_isochrones(
-            t, dt, isocrone, nextwp, point_f, self.get_param_value("subdiv")
-        )
+    def close(self) -> None:
+        """Shuts down the executor owned by the router, if any"""
+        if self._owned_executor is not None:
+            self._owned_executor.shutdown()
+            self._owned_executor = None
+            self._worker_context = None
 
-    def calculate_isochrones(self, t, dt, isocrone, nextwp):
-        """Calculate isochrones depending on routageSpeed from polar"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-        def point_f(p, tws, twa, dt, brg):
-            speed = self.polar.get_speed(tws, math.copysign(twa, 1))
-            # Issue 19 : for routage_point_distance defaut distance unit is nm
-            #  speed*dt is nm  (don't convert in km)
-            rpd = (
-                utils.routage_point_distance(p[0], p[1], speed * dt, brg),
-                speed,
+    def get_max_speed(self) -> float:
+        """Returns the maximum boat speed (knots) of the polar, for any tws"""
+        if self._max_speed is None:
+            self._max_speed = max(
+                self.polar.get_reaching(float(tws))[0] for tws in self.polar.tws
             )
-            # print ('tws', tws, 'sog', speed, 'twa', math.degrees(twa), 'brg',
-            # math.degrees(brg), 'rpd', rpd)tox
+        return self._max_speed
 
-            return rpd
+    def get_geodesy(self) -> Geodesy:
+        """Returns the geodesy backend selected by the geodesy param"""
+        return get_geodesy(self.get_param_value("geodesy"))
 
+    def get_heading_sampler(self, polar=None) -> Optional[HeadingSampler]:
+        """Returns the HeadingSampler selected by the adaptive_headings param, or None
+        for the fixed sweep"""
+        if not self.get_param_value("adaptive_headings"):
+            return None
+        return HeadingSampler(
+            int(self.get_param_value("heading_budget")), self.get_geodesy(), polar
+        )
+
+    def calculate_shortest_path_isochrones(self, fixed_speed, t, dt, isocrone, nextwp):
+        """Calculates isochrones based on shortest path at fixed speed in knots (motoring);
+        the speed considers reductions / increases derived from leeway"""
         return self._calculate_isochrones(
-            t, dt, isocrone, nextwp, point_f, self.get_param_value("subdiv")
+            t,
+            dt,
+            isocrone,
+            nextwp,
+            FixedSpeedPointFunction(fixed_speed, self.get_geodesy()),
+            self.get_param_value("subdiv"),
         )
 
-    def _filter_validity(self, isonew, last):  # noqa: C901
-        def valid_point(a):
-            if not self.point_validity(a.pos[0], a.pos[1]):
-                return False
-            return True
+    def calculate_isochrones(self, t, dt, isocrone, nextwp):
+        """Calculate isochrones depending on routageSpeed from polar"""
+        return self._calculate_isochrones(
+            t,
+            dt,
+            isocrone,
+            nextwp,
+            PolarPointFunction(self.polar, self.get_geodesy()),
+            self.get_param_value("subdiv"),
+        )
 
-        def valid_line(a):
-            if not self.line_validity(
-                a.pos[0], a.pos[1], last[a.prev_idx].pos[0], last[a.prev_idx].pos[1]
-            ):
-                return False
-            return True
+    def validity_mask(self, lats, lons, prev_lats, prev_lons) -> np.ndarray:
+        """Returns the mask of the points (lats, lons) reached from (prev_lats,
+        prev_lons) that pass the validity functions; each function is only called on
+        the points that passed the previous ones"""
+        lat = np.asarray(lats, dtype=np.float64).tolist()
+        lon = np.asarray(lons, dtype=np.float64).tolist()
+        prev_lat = np.asarray(prev_lats, dtype=np.float64).tolist()
+        prev_lon = np.asarray(prev_lons, dtype=np.float64).tolist()
+        valid = np.ones(len(lat), dtype=bool)
 
         if self.point_validity:
-            isonew = list(filter(valid_point, isonew))
+            for x in np.flatnonzero(valid).tolist():
+                valid[x] = self.point_validity(lat[x], lon[x])
         if self.line_validity:
-            isonew = list(filter(valid_line, isonew))
+            for x in np.flatnonzero(valid).tolist():
+                valid[x] = self.line_validity(lat[x], lon[x], prev_lat[x], prev_lon[x])
         if self.points_validity:
-            pp = list(map(lambda a: a.pos, isonew))
-            pv = self.points_validity(pp)
-
-            for x in range(len(isonew)):
-                if not pv[x]:
-                    isonew[x] = None
-            isonew = list(filter(lambda a: a is not None, isonew))
+            idx = np.flatnonzero(valid).tolist()
+            pv = self.points_validity([(lat[x], lon[x]) for x in idx])
+            valid[idx] = np.asarray(pv, dtype=bool)
         if self.lines_validity:
-            pp = list(
-                map(
-                    lambda a: [
-                        a.pos[0],
-                        a.pos[1],
-                        last[a.prev_idx].pos[0],
-                        last[a.prev_idx].pos[1],
-                    ],
-                    isonew,
-                )
+            idx = np.flatnonzero(valid).tolist()
+            pv = self.lines_validity(
+                [[lat[x], lon[x], prev_lat[x], prev_lon[x]] for x in idx]
             )
-            pv = self.lines_validity(pp)
+            valid[idx] = np.asarray(pv, dtype=bool)
 
-            for x in range(len(isonew)):
-                if not pv[x]:
-                    isonew[x] = None
-            isonew = list(filter(lambda a: a is not None, isonew))
+        return valid
 
-        return isonew
+    def _filter_validity(self, iso, last) -> Isochrone:
+        """Returns the points of iso passing the validity functions"""
+        return iso.take(
+            self.validity_mask(
+                iso.lat, iso.lon, last.lat[iso.prev_idx], last.lon[iso.prev_idx]
+            )
+        )
 
-    def _calculate_isochrones(  # noqa: C901
-        self, t, dt, isocrone, nextwp, point_f, subdiv
-    ):
-        """Calcuates isochrones based on pointF next point calculation"""
-        last = isocrone[-1]
+    def _prune(self, iso, nextwp, isocrone) -> Isochrone:
+        """Router specific pruning of the new isochrone iso (sorted by bearing from the
+        start), applied to the valid points after the generic pruning and before the
+        max_points cap; isocrone is the history of the leg, iso excluded. It keeps all
+        the points"""
+        return iso
 
-        newisopoints = []
+    @staticmethod
+    def _prune_sectors(iso, subdiv) -> Isochrone:
+        """Keeps, for each sector of subdiv degrees of bearing from the start, the point
+        nearest to the next waypoint (ties go to the lowest bearing); returns them
+        sorted by bearing from the start"""
+        if len(iso) == 0:
+            return iso
+        sector = np.trunc(np.degrees(iso.los_brg) / subdiv).astype(np.intp)
+        sector -= sector.min()
 
-        def _calculate_iso_points(i):
-            last = isocrone[-1]
-            cisos = []
-            p = last[i]
+        selected = _first_min(sector, iso.next_wp_dist)
+        selected = _first_min(sector, iso.los_brg, selected)
+        selected = _first_min(sector, np.arange(len(iso), dtype=np.float64), selected)
 
-            try:
-                (twd, tws) = self.grib.get_wind_at(t, p.pos[0], p.pos[1])
-            except Exception as e:
-                raise RoutingNoWindError() from e
+        idx = np.flatnonzero(selected)
+        return iso.take(idx[np.argsort(iso.los_brg[idx], kind="stable")])
 
-            twd = math.radians(twd)
-            tws = utils.ms_to_knots(tws)
+    @staticmethod
+    def _dedup(iso, tolerance) -> Isochrone:
+        """Hashes the points of iso on a grid of tolerance nm cells and keeps the point
+        nearest to the next waypoint of each cell (all the points of an isochrone
+        share the same time); the order of the points is preserved"""
+        if len(iso) == 0:
+            return iso
+        cell_lat = np.floor(iso.lat * 60.0 / tolerance)
+        scale = np.cos(np.radians((cell_lat + 0.5) * tolerance / 60.0))
+        cell_lon = np.floor(iso.lon * 60.0 * scale / tolerance)
+        cell = np.unique(
+            np.column_stack((cell_lat, cell_lon)), axis=0, return_inverse=True
+        )[1]
+        cell = cell.reshape(-1)
 
-            for twa in range(-180, 180, 5):
-                twa = math.radians(twa)
-                brg = utils.reduce360(twd + twa)
+        selected = _first_min(cell, iso.next_wp_dist)
+        selected = _first_min(cell, np.arange(len(iso), dtype=np.float64), selected)
+        return iso.take(selected)
 
-                # Calculate next point
-                ptoiso, speed = point_f(p.pos, tws, twa, dt, brg)
+    @staticmethod
+    def _downsample(iso, max_points) -> Isochrone:
+        """Reduces iso (sorted by bearing from the start) to max_points points: the
+        most advanced point of each of max_points / 2 equal bearing bins is kept to
+        preserve the angular spread, and the remaining slots are filled with the
+        most advanced of the other points; the bearing order is preserved"""
+        if len(iso) <= max_points:
+            return iso
+        nbins = max(1, max_points // 2)
+        span = iso.los_brg[-1] - iso.los_brg[0]
+        if span > 0:
+            group = ((iso.los_brg - iso.los_brg[0]) * (nbins / span)).astype(np.intp)
+            group = np.minimum(group, nbins - 1)
+        else:
+            group = np.zeros(len(iso), dtype=np.intp)
 
-                nextwpdist = utils.point_distance(
-                    ptoiso[0], ptoiso[1], nextwp[0], nextwp[1]
-                )
-                startwplos = isocrone[0][0].lossodromic((ptoiso[0], ptoiso[1]))
-
-                if nextwpdist > p.next_wp_dist:
-                    continue
-
-                # if self.point_validity:
-                # 	if not self.point_validity (ptoiso[0], ptoiso[1]):
-                # 		continue
-                # if self.line_validity:
-                # 	if not self.line_validity (ptoiso[0], ptoiso[1], p.pos[0], p.pos[1]):
-                # 		continue
-
-                cisos.append(
-                    IsoPoint(
-                        (ptoiso[0], ptoiso[1]),
-                        i,
-                        t,
-                        twd,
-                        tws,
-                        speed,
-                        math.degrees(brg),
-                        nextwpdist,
-                        startwplos,
-                    )
-                )
+        selected = _first_min(group, iso.next_wp_dist)
+        selected = _first_min(group, np.arange(len(iso), dtype=np.float64), selected)
 
-            return cisos
+        others = np.flatnonzero(~selected)
+        fill = max_points - int(np.count_nonzero(selected))
+        order = np.argsort(iso.next_wp_dist[others], kind="stable")
+        selected[others[order[:fill]]] = True
 
-        # foreach point of the iso
+        res = iso.take(selected)
+        res.dropped = len(iso) - len(res)
+        return res
+
+    @staticmethod
+    def _compact_history(isocrone) -> None:
+        """Drops from the past isochrones the points that are not ancestors of the
+        last one, reindexing the prev_idx chain; every past layer is kept reduced to
+        the ancestors of the next one, so the walk stops at the first layer whose
+        points are all still needed"""
+        for k in range(len(isocrone) - 2, -1, -1):
+            child = isocrone[k + 1]
+            needed = np.unique(child.prev_idx)
+            layer = isocrone[k]
+            if len(needed) == len(layer):
+                break
+
+            mapping = np.full(len(layer), -1, dtype=np.intp)
+            mapping[needed] = np.arange(len(needed))
+            child.prev_idx = mapping[child.prev_idx]
+
+            compact = layer.take(needed)
+            compact.dropped = layer.dropped
+            isocrone[k] = compact
 
-        if self.get_param_value("concurrent"):
-            executor = ThreadPoolExecutor()
-            for x in executor.map(_calculate_iso_points, range(0, len(last))):
-                newisopoints.extend(x)
+    @staticmethod
+    def _envelope_mask(iso) -> np.ndarray:
+        """Returns the mask of the points of iso (sorted by bearing from the start)
+        that are not in a single point dent of the frontier: a point is dropped when it
+        is on the start side of the chord joining its two neighbours. It is a local
+        test, run once: wider dents are kept, as the reachable area is not convex (eg
+        upwind, or behind an obstacle) and a hull of the frontier would drop points
+        of the optimal route"""
+        keep = np.ones(len(iso), dtype=bool)
+        if len(iso) < 3:
+            return keep
+
+        x = iso.los_dist * np.sin(iso.los_brg)
+        y = iso.los_dist * np.cos(iso.los_brg)
+        ax, ay = x[:-2], y[:-2]
+        bx, by = x[2:] - ax, y[2:] - ay
+        side_p = bx * (y[1:-1] - ay) - by * (x[1:-1] - ax)
+        side_start = bx * -ay - by * -ax
+        inside = (side_p * side_start > 0) & (np.abs(side_p) < np.abs(side_start))
+        inside &= iso.los_brg[2:] - iso.los_brg[:-2] < math.pi
+        keep[1:-1] = ~inside
+        return keep
+
+    def _expand_vectorized(
+        self, t, dt, isocrone, nextwp, move_f, headings_f=None
+    ) -> Isochrone:
+        """Calculates the candidate points of all the (points x headings) of the last
+        isochrone in a single batched pass; move_f(tws, twa, dt) returns the arrays of
+        (distance in nm, speed) for the given tws and twa arrays"""
+        last = isocrone[-1]
+        if len(last) == 0:
+            return Isochrone(time=t)
+        start = isocrone[0][0].pos
+        geodesy = self.get_geodesy()
+
+        try:
+            wind = np.array(
+                [
+                    self.grib.get_wind_at(t, lat, lon)
+                    for lat, lon in zip(last.lat.tolist(), last.lon.tolist())
+                ],
+                dtype=np.float64,
+            ).reshape(-1, 2)
+        except Exception as e:
+            raise RoutingNoWindError() from e
 
-            executor.shutdown()
+        twd = np.radians(wind[:, 0])[:, None]
+        tws = (wind[:, 1] * utils.MS2KT)[:, None]
+        if headings_f is not None:
+            twa = np.array(
+                [
+                    headings_f(p.pos, d, w, nextwp)
+                    for p, d, w in zip(last, twd[:, 0].tolist(), tws[:, 0].tolist())
+                ]
+            ).reshape(len(last), -1)
         else:
-            for i in range(0, len(last)):
-                newisopoints += _calculate_iso_points(i)
+            twa = np.array(HEADINGS_SWEEP)[None, :]
+        brg = utils.reduce360_many(twd + twa)
 
-        newisopoints = sorted(newisopoints, key=(lambda a: a.start_wp_los[1]))
+        distance, speed = move_f(tws, twa, dt)
+        shape = np.broadcast(twd, twa).shape
+        wp_brg = geodesy.lossodromic_many(last.lat, last.lon, nextwp[0], nextwp[1])[1]
+        keep = ~early_rejection_mask(
+            last.next_wp_dist[:, None], distance, brg - wp_brg[:, None]
+        )
+        keep = np.broadcast_to(keep, shape)
 
-        # Remove slow isopoints inside
-        bearing = {}
-        for x in newisopoints:
-            k = str(int(math.degrees(x.start_wp_los[1]) / subdiv))
+        def kept(a):
+            return np.broadcast_to(a, shape)[keep]
 
-            if k in bearing:
-                if x.next_wp_dist < bearing[k].next_wp_dist:
-                    bearing[k] = x
-            else:
-                bearing[k] = x
+        prev_idx = kept(np.arange(len(last))[:, None])
+        lat, lon = geodesy.routage_point_distance_many(
+            last.lat[prev_idx], last.lon[prev_idx], kept(distance), kept(brg)
+        )
+        nextwpdist = geodesy.point_distance_many(lat, lon, nextwp[0], nextwp[1])
 
-        isonew = self._filter_validity(list(bearing.values()), last)
-        isonew = sorted(isonew, key=(lambda a: a.start_wp_los[1]))
-        isocrone.append(isonew)
+        mask = nextwpdist <= last.next_wp_dist[prev_idx]
+        lat = lat[mask]
+        lon = lon[mask]
+        los_dist, los_brg = geodesy.lossodromic_many(start[0], start[1], lat, lon)
+        return Isochrone(
+            time=t,
+            prev_idx=prev_idx[mask],
+            lat=lat,
+            lon=lon,
+            twd=kept(twd)[mask],
+            tws=kept(tws)[mask],
+            speed=kept(speed)[mask],
+            brg=np.degrees(kept(brg)[mask]),
+            next_wp_dist=nextwpdist[mask],
+            los_dist=los_dist,
+            los_brg=los_brg,
+        )
 
-        # print(f"Before filtre: {len(newisopoints)}\tAfter filter: {len(isonew)}")
+    def _calculate_isochrones(  # noqa: C901
+        self, t, dt, isocrone, nextwp, point_f, subdiv, move_f=None
+    ):
+        """Calcuates isochrones based on pointF next point calculation; if the
+        vectorized param is set, move_f (default to point_f.move) is used for a batched
+        expansion instead"""
+        last = isocrone[-1]
+        start = isocrone[0][0].pos
+        geodesy = self.get_geodesy()
+
+        if move_f is None:
+            move_f = getattr(point_f, "move", None)
+        headings_f = self.get_heading_sampler(getattr(point_f, "polar", None))
+
+        # foreach point of the iso
+        if move_f is not None and self.get_param_value("vectorized"):
+            candidates = self._expand_vectorized(
+                t, dt, isocrone, nextwp, move_f, headings_f
+            )
+        elif self.get_param_value("concurrent") and len(last) > 1:
+            bounds = np.linspace(0, len(last), min(len(last), os.cpu_count() or 1) + 1)
+            bounds = bounds.astype(int)
+            executor = self.get_executor(point_f, headings_f)
+            chunks = [
+                (geodesy, t, dt, start, nextwp, last.take(slice(a, b)), a)
+                for a, b in zip(bounds[:-1], bounds[1:])
+            ]
+            if executor is self._owned_executor and self._worker_context is not None:
+                chunk_f = _expand_worker_chunk
+            else:
+                chunk_f = _expand_chunk
+                chunks = [(self.grib, point_f) + c + (headings_f,) for c in chunks]
+            candidates = Isochrone.concatenate(list(executor.map(chunk_f, chunks)), t)
+        else:
+            candidates = _expand_points(
+                self.grib, point_f, geodesy, t, dt, start, nextwp, last, 0, headings_f
+            )
+        # Remove slow isopoints inside
+        isonew = self._prune_sectors(candidates, subdiv)
+        if self.corridor is not None and self.get_param_value("corridor_width") > 0:
+            width = self.get_param_value("corridor_width")
+            inside = corridor_distance(isonew.lat, isonew.lon, self.corridor) <= width
+            # the corridor is a hint: it never empties an isochrone
+            if inside.any():
+                isonew = isonew.take(inside)
+        # the following pruning steps only see the valid points: the winner of a
+        # dedup cell or the most advanced points kept by the cap could be invalid,
+        # and an invalid point sticking out of the frontier would make its valid
+        # neighbours look like a dent
+        isonew = self._filter_validity(isonew, last)
+        if self.get_param_value("dedup_tolerance") > 0:
+            isonew = self._dedup(isonew, self.get_param_value("dedup_tolerance"))
+        if self.get_param_value("envelope_pruning"):
+            isonew = isonew.take(self._envelope_mask(isonew))
+        isonew = self._prune(isonew, nextwp, isocrone)
+        if self.get_param_value("max_points") > 0:
+            isonew = self._downsample(isonew, int(self.get_param_value("max_points")))
+        isonew.time = t
+        isonew.target = tuple(nextwp)
+        isocrone.append(isonew)
+        if self.get_param_value("compact_history"):
+            self._compact_history(isocrone)
 
         return isocrone
 
@@ -14,6 +14,7 @@
 # GNU General Public License for more details.
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
+from .. import utils
 from .linearbestisorouter import LinearBestIsoRouter, RouterParam, RoutingResult
 
 
@@ -44,6 +45,11 @@ class ShortestPathRouter(LinearBestIsoRouter):
         ),
     }
 
+    def get_max_speed(self) -> float:
+        """Returns the distance (nm) the points actually move in an hour:
+        FixedSpeedPointFunction scales fixed_speed by NAUTICAL_MILE_IN_KM"""
+        return self.get_param_value("fixed_speed") * utils.NAUTICAL_MILE_IN_KM
+
     def route(self, lastlog, t, timedelta, start, end) -> RoutingResult:
         return self._route(
             lastlog,
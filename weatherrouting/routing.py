@@ -12,9 +12,11 @@
 # GNU General Public License for more details.
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
-from typing import List
+from collections import deque
+from typing import List, Optional
 
-from .routers import RoutingResult, linearbestisorouter
+from .routers import RoutingResult, heuristicisorouter, linearbestisorouter, meshrouter
+from .scheduler import TimeStepScheduler
 
 
 def list_routing_algorithms():
@@ -24,7 +26,15 @@ def list_routing_algorithms():
         {
             "name": "LinearBestIsoRouter",
             "class": linearbestisorouter.LinearBestIsoRouter,
-        }
+        },
+        {
+            "name": "HeuristicIsoRouter",
+            "class": heuristicisorouter.HeuristicIsoRouter,
+        },
+        {
+            "name": "MeshRouter",
+            "class": meshrouter.MeshRouter,
+        },
     ]
 
 
@@ -45,6 +55,11 @@ class Routing:
         line_validity=None,
         points_validity=None,
         lines_validity=None,
+        executor=None,
+        log_size=None,
+        corridor_width=None,
+        coarse_timedelta=6,
+        scheduler=None,
     ):
         """
         Parameters
@@ -80,20 +95,57 @@ class Routing:
                 A functions that receives a list of vectors defined by lat1, lon1, lat2, lon2
                 and returns a list of boolean with True if the line at i is valid (ie:
                 completely in the sea)
+        executor : concurrent.futures.Executor
+                Optional, default to None
+                An executor used by the concurrent calculation, that can be shared between
+                many routings; if None, the router creates its own pool when needed and
+                keeps it until close()
+        log_size : int
+                Optional, default to None
+                Number of step results kept in log (the last ones); None keeps all of
+                them, 0 none
+        corridor_width : float
+                Optional, default to None
+                If set, a coarse routing (see run_coarse) is run first, and the routing
+                is then restricted to a corridor of this width (nm) around its route
+        coarse_timedelta : float
+                Optional, default to 6
+                Step duration (hours) of the coarse routing, also run first to set the
+                incumbent of a HeuristicIsoRouter without one
+        scheduler : TimeStepScheduler
+                Optional, default to None
+                The scheduler picking the duration of the steps called without
+                timedelta; if None, these steps last 1 hour
 
         """
 
         self.end = False
+        self.start_datetime = start_datetime
+        self.start_position = start_position
+        self.corridor_width = corridor_width
+        self.coarse_timedelta = coarse_timedelta
+        self.coarse_result: Optional[RoutingResult] = None
+        self.scheduler = scheduler
         self.algorithm = algorithm(
-            polar, grib, point_validity, line_validity, points_validity, lines_validity
+            polar,
+            grib,
+            point_validity,
+            line_validity,
+            points_validity,
+            lines_validity,
         )
+        # set afterwards, so that the routers with their own constructor keep working
+        if executor is not None:
+            self.algorithm.executor = executor
         self.track = track
         self.steps = 0
         self.path = []
         self.time = start_datetime
         self.grib = grib
-        self.log = []
+        self.log = [] if log_size is None else deque(maxlen=log_size)
+        self._last_result = None
         self._startingNewPoint = True
+        self._coarse_pass = False
 
         if start_position:
             self.wp = 0
@@ -102,60 +154,177 @@ class Routing:
             self.wp = 1
             self.position = self.track[0]
 
+    def run_coarse(
+        self, timedelta=6, subdiv=5, heading_budget=16, max_steps=1000
+    ) -> Optional[RoutingResult]:
+        """Runs a cheap routing of the whole track (long steps, few headings and wide
+        subdiv) and sets its route as the corridor of the routing algorithm, and as
+        the incumbent of a HeuristicIsoRouter; returns its last result, usable as a
+        preview, or None if it did not end in max_steps
+
+        Parameters
+        ----------
+        timedelta : float
+                Optional, default to 6
+                Step duration (hours)
+        subdiv : int
+                Optional, default to 5
+                Filtering subdivision of isopoint resolution
+        heading_budget : int
+                Optional, default to 16
+                Number of adaptive headings expanded per point
+        max_steps : int
+                Optional, default to 1000
+                Maximum number of steps
+        """
+        algorithm = self.algorithm
+        coarse = Routing(
+            algorithm.__class__,
+            algorithm.polar,
+            self.track,
+            self.grib,
+            self.start_datetime,
+            self.start_position,
+            algorithm.point_validity,
+            algorithm.line_validity,
+            algorithm.points_validity,
+            algorithm.lines_validity,
+            executor=algorithm.executor,
+            log_size=0,
+            scheduler=TimeStepScheduler(
+                min(1.0, timedelta), timedelta, wind_change=None, validity=False
+            ),
+        )
+        coarse._coarse_pass = True
+        params = {code: p.value for code, p in algorithm.PARAMS.items()}
+        params.update(
+            subdiv=subdiv,
+            adaptive_headings=True,
+            heading_budget=heading_budget,
+            corridor_width=0.0,
+        )
+        for code, value in params.items():
+            if code in coarse.algorithm.PARAMS:
+                coarse.algorithm.set_param_value(code, value)
+
+        # Long steps overshoot the waypoints: near them the scheduler shortens the
+        # step to the time needed to reach them at the maximum boat speed
+        with coarse:
+            res = None
+            while not coarse.end and coarse.steps < max_steps:
+                res = coarse.step()
+        if not coarse.end:
+            return None
+
+        self.coarse_result = res
+        if isinstance(algorithm, heuristicisorouter.HeuristicIsoRouter):
+            algorithm.set_incumbent(coarse.path)
+        if "corridor_width" in algorithm.PARAMS:
+            algorithm.set_corridor([p.pos for p in coarse.path])
+            if self.corridor_width is not None:
+                algorithm.set_param_value("corridor_width", self.corridor_width)
+        return res
+
+    def _needs_coarse(self) -> bool:
+        """Returns True if the coarse routing has to run before the first step: for
+        the corridor, or for the incumbent of a HeuristicIsoRouter without one (the
+        coarse routing itself never runs another one)"""
+        if self._coarse_pass:
+            return False
+        if self.corridor_width is not None:
+            return True
+        return (
+            isinstance(self.algorithm, heuristicisorouter.HeuristicIsoRouter)
+            and self.algorithm.incumbent is None
+        )
+
+    def close(self) -> None:
+        """Releases the resources (executor) owned by the routing algorithm"""
+        self.algorithm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def get_current_best_path(self) -> List:
         last_wp = (self.wp - 1) if self.wp >= len(self.track) else self.wp
-        return self.algorithm.get_current_best_path(self.log[-1], self.track[last_wp])
+        return self.algorithm.get_current_best_path(
+            self._last_result, self.track[last_wp]
+        )
+
+    def get_timedelta(self) -> float:
+        """Returns the duration (hours) of the next step picked by the scheduler, 1 if
+        there is no scheduler"""
+        if self.scheduler is None or self.wp >= len(self.track):
+            return 1
+
+        iso = None
+        if not self._startingNewPoint and self._last_result is not None:
+            if len(self._last_result.isochrones) > 0:
+                iso = self._last_result.isochrones[-1]
+        return self.scheduler(
+            self.algorithm, self.time, self.position, self.track[self.wp], iso
+        )
 
-    def step(self, timedelta=1) -> RoutingResult:
-        """Execute a single routing step"""
+    def step(self, timedelta=None) -> RoutingResult:
+        """Execute a single routing step, lasting timedelta hours or, if None, the
+        duration picked by the scheduler"""
+        if self.steps == 0 and self.coarse_result is None and self._needs_coarse():
+            self.run_coarse(self.coarse_timedelta)
         self.steps += 1
 
         if self.wp >= len(self.track):
             self.end = True
-            res = self.log[-1]
-            return self.log[-1]
+            self.close()
+            return self._last_result
 
         # Next waypoint
         nextwp = self.track[self.wp]
+        if timedelta is None:
+            timedelta = self.get_timedelta()
 
-        if self._startingNewPoint or len(self.log) == 0:
+        if self._startingNewPoint or self._last_result is None:
             res = self.algorithm.route(
                 None, self.time, timedelta, self.position, nextwp
             )
             self._startingNewPoint = False
         else:
             res = self.algorithm.route(
-                self.log[-1], self.time, timedelta, self.position, nextwp
+                self._last_result, self.time, timedelta, self.position, nextwp
             )
 
         # self.time += 0.2
         ff = 100 / len(self.track)
-        progress = ff * self.wp + len(self.log) % ff
+        progress = ff * self.wp + (self.steps - 1) % ff
 
         if len(res.path) != 0:
             self.position = res.position
-            self.path = self.path + res.path
             self.wp += 1
             self._startingNewPoint = True
 
-        np = []
-        ptime = None
-        for x in self.path:
-            nt = x.time
+            # Append the new segment, dropping the points not after the path end; the
+            # path list is replaced (not extended) as past results share it
+            ptime = self.path[-1].time if len(self.path) > 0 else None
+            np = []
+            for x in res.path:
+                nt = x.time
 
-            if ptime:
-                if ptime < nt:
+                if ptime:
+                    if ptime < nt:
+                        np.append(x)
+                        ptime = nt
+                else:
                     np.append(x)
                     ptime = nt
-            else:
-                np.append(x)
-                ptime = nt
+            self.path = self.path + np
 
-        self.path = np
         self.time = res.time
         nlog = RoutingResult(
             progress=progress, time=res.time, path=self.path, isochrones=res.isochrones
         )
 
+        self._last_result = nlog
         self.log.append(nlog)
         return nlog
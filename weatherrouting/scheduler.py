@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2017-2025 Davide Gessa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# For detail about GNU see <http://www.gnu.org/licenses/>.
+import datetime
+import math
+from typing import Optional
+
+import numpy as np
+
+from . import utils
+
+# bearing offsets (from the waypoint direction) of the invalid areas probes
+PROBE_OFFSETS = np.radians([-45.0, 0.0, 45.0])
+
+
+class TimeStepScheduler:
+    """
+    Picks the duration of each routing step, between min_timedelta and
+    max_timedelta: the step is as long as possible offshore, and it is shortened
+
+    - near the waypoint, to half the time needed to reach it at the maximum boat
+      speed: the approach is refined down to min_timedelta, the arrival precision
+    - near the invalid areas, halving it until a step at the maximum boat speed from
+      the probed points of the isochrone is valid
+    - where the wind changes, in proportion to the change of the wind vector met by
+      a step toward the waypoint, above wind_change
+    """
+
+    def __init__(
+        self,
+        min_timedelta=0.25,
+        max_timedelta=6.0,
+        wind_change: Optional[float] = 5.0,
+        validity=True,
+        probes=8,
+    ):
+        """
+        Parameters
+        ----------
+        min_timedelta : float
+                Optional, default to 0.25
+                Minimum step duration (hours)
+        max_timedelta : float
+                Optional, default to 6.0
+                Maximum step duration (hours)
+        wind_change : float
+                Optional, default to 5.0
+                Change of the wind vector (knots) allowed in a step; None disables the
+                wind check
+        validity : bool
+                Optional, default to True
+                If True, the steps are shortened near the invalid areas
+        probes : int
+                Optional, default to 8
+                Number of isochrone points probed for the wind and validity checks
+        """
+        self.min_timedelta = min_timedelta
+        self.max_timedelta = max_timedelta
+        self.wind_change = wind_change
+        self.validity = validity
+        self.probes = probes
+
+    def __call__(self, algorithm, time, position, nextwp, iso=None) -> float:
+        """Returns the duration (hours) of the step from time toward nextwp; iso is the
+        last isochrone of the leg, None at its start (position is then the start)"""
+        vmax = algorithm.get_max_speed()
+        if vmax <= 0:
+            return self.max_timedelta
+
+        geodesy = algorithm.get_geodesy()
+        if iso is not None and len(iso) > 0 and iso.target == tuple(nextwp):
+            remaining = float(iso.next_wp_dist.min())
+            idx = np.linspace(0, len(iso) - 1, min(self.probes, len(iso)))
+            idx = np.unique(np.append(idx.round().astype(np.intp), iso.nearest_index()))
+            lats, lons = iso.lat[idx], iso.lon[idx]
+        else:
+            remaining = geodesy.point_distance(
+                position[0], position[1], nextwp[0], nextwp[1]
+            )
+            lats = np.array([position[0]], dtype=np.float64)
+            lons = np.array([position[1]], dtype=np.float64)
+
+        dt = min(self.max_timedelta, max(self.min_timedelta, remaining / vmax / 2))
+        brgs = geodesy.lossodromic_many(lats, lons, nextwp[0], nextwp[1])[1]
+
+        if self.validity and (
+            algorithm.point_validity
+            or algorithm.line_validity
+            or algorithm.points_validity
+            or algorithm.lines_validity
+        ):
+            plats = np.repeat(lats, len(PROBE_OFFSETS))
+            plons = np.repeat(lons, len(PROBE_OFFSETS))
+            headings = (brgs[:, None] + PROBE_OFFSETS).ravel()
+            while dt > self.min_timedelta:
+                elats, elons = geodesy.routage_point_distance_many(
+                    plats, plons, vmax * dt, headings
+                )
+                if algorithm.validity_mask(elats, elons, plats, plons).all():
+                    break
+                dt = max(self.min_timedelta, dt / 2)
+
+        if self.wind_change is not None and dt > self.min_timedelta:
+            change = self._wind_change(algorithm, time, dt, lats, lons, vmax * dt, brgs)
+            if change > self.wind_change:
+                dt = max(self.min_timedelta, dt * self.wind_change / change)
+
+        return dt
+
+    @staticmethod
+    def _wind_change(algorithm, time, dt, lats, lons, distance, brgs) -> float:
+        """Returns the largest change (knots) of the wind vector between the points
+        (lats, lons) at time and the points distance nm away along brgs after dt hours;
+        the points out of the grib scope are skipped"""
+        elats, elons = algorithm.get_geodesy().routage_point_distance_many(
+            lats, lons, distance, brgs
+        )
+        end_time = time + datetime.timedelta(hours=dt)
+        change = 0.0
+        for i in range(len(lats)):
+            try:
+                w0 = algorithm.grib.get_wind_at(time, float(lats[i]), float(lons[i]))
+                w1 = algorithm.grib.get_wind_at(
+                    end_time, float(elats[i]), float(elons[i])
+                )
+            except Exception:
+                continue
+            if w0 is None or w1 is None:
+                continue
+
+            (u0, v0), (u1, v1) = [
+                (
+                    utils.ms_to_knots(tws) * math.sin(math.radians(twd)),
+                    utils.ms_to_knots(tws) * math.cos(math.radians(twd)),
+                )
+                for twd, tws in (w0, w1)
+            ]
+            change = max(change, math.hypot(u1 - u0, v1 - v0))
+        return change
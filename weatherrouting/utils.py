@@ -15,19 +15,73 @@
 
 # For detail about GNU see <http://www.gnu.org/licenses/>.
 import math
-from typing import Tuple
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
 
 import latlon
+import numpy as np
 
 # from geographiclib.geodesic import Geodesic
 # geod = Geodesic.WGS84
 
 EARTH_RADIUS = 60.0 * 360 / (2 * math.pi)  # nm
+# Radius of the sphere used by the spherical geodesy (the latlon3 / pyproj "sphere")
+SPHERE_RADIUS = 6370.997  # km
 NAUTICAL_MILE_IN_KM = 1.852
 # Speed conversion m/s to kt
 MS2KT = 1.94384
 
 
+class LRUCache:
+    """A thread-safe mapping holding at most maxsize items, evicting the least
+    recently used one when full"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        """Returns the (key, value) items, from the least recently used one; using
+        them does not change their order"""
+        with self._lock:
+            return list(self._data.items())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getstate__(self):
+        with self._lock:
+            return {"maxsize": self.maxsize, "_data": OrderedDict(self._data)}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
 def ms_to_knots(v: float) -> float:
     return v * MS2KT
 
@@ -118,9 +172,126 @@ def routage_point_distance(
     return (float(of[0]), float(of[1]))
 
 
+def sphere_point_distance(
+    lat_a: float, lon_a: float, lat_b: float, lon_b: float, unit: str = "nm"
+) -> float:
+    """Returns the great circle distance between two geo points on a sphere"""
+    p1 = math.radians(lat_a)
+    p2 = math.radians(lat_b)
+    a = (
+        math.sin((p2 - p1) / 2) ** 2
+        + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon_b - lon_a) / 2) ** 2
+    )
+    d = 2 * SPHERE_RADIUS * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    if unit == "nm":
+        return km2nm(d)
+    else:  # if unit == "km":
+        return d
+
+
+def sphere_routage_point_distance(
+    lat_a: float, lon_a: float, distance: float, hdg: float, unit: str = "nm"
+) -> Tuple[float, float]:
+    """Returns the point from (lat_a, lon_a) to the given (distance, hdg) on a sphere"""
+    if unit == "nm":
+        d = nm2km(distance)
+    elif unit == "km":
+        d = distance
+
+    d = d / SPHERE_RADIUS
+    p1 = math.radians(lat_a)
+    sin_p1 = math.sin(p1)
+    cos_p1 = math.cos(p1)
+    sin_d = math.sin(d)
+    cos_d = math.cos(d)
+
+    sin_p2 = sin_p1 * cos_d + cos_p1 * sin_d * math.cos(hdg)
+    p2 = math.asin(max(-1.0, min(1.0, sin_p2)))
+    dl = math.atan2(math.sin(hdg) * sin_d * cos_p1, cos_d - sin_p1 * sin_p2)
+    lon = (lon_a + math.degrees(dl) + 540.0) % 360.0 - 180.0
+    return (math.degrees(p2), lon)
+
+
+def sphere_lossodromic(
+    lat_a: float, lon_a: float, lat_b: float, lon_b: float
+) -> Tuple[float, float]:
+    """Returns the distance in km between A and B on a sphere and the initial
+    bearing (radians, -pi..pi) from A to B"""
+    p1 = math.radians(lat_a)
+    p2 = math.radians(lat_b)
+    dl = math.radians(lon_b - lon_a)
+    cos_p2 = math.cos(p2)
+    brg = math.atan2(
+        math.sin(dl) * cos_p2,
+        math.cos(p1) * math.sin(p2) - math.sin(p1) * cos_p2 * math.cos(dl),
+    )
+    return (sphere_point_distance(lat_a, lon_a, lat_b, lon_b, "km"), brg)
+
+
+def point_distance_many(lats_a, lons_a, lats_b, lons_b, unit: str = "nm") -> np.ndarray:
+    """Array version of sphere_point_distance; inputs are broadcasted together"""
+    p1 = np.radians(lats_a)
+    p2 = np.radians(lats_b)
+    a = (
+        np.sin((p2 - p1) / 2) ** 2
+        + np.cos(p1)
+        * np.cos(p2)
+        * np.sin(np.radians(np.subtract(lons_b, lons_a)) / 2) ** 2
+    )
+    d = 2 * SPHERE_RADIUS * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    if unit == "nm":
+        return d * km2nm(1.0)
+    else:  # if unit == "km":
+        return d
+
+
+def routage_point_distance_many(
+    lats, lons, distances, headings, unit: str = "nm"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Array version of sphere_routage_point_distance; inputs are broadcasted together
+    and the (lats, lons) arrays of the reached points are returned"""
+    d = np.asarray(distances, dtype=np.float64)
+    if unit == "nm":
+        d = d * nm2km(1.0)
+
+    d = d / SPHERE_RADIUS
+    p1 = np.radians(lats)
+    sin_p1 = np.sin(p1)
+    cos_p1 = np.cos(p1)
+    sin_d = np.sin(d)
+    cos_d = np.cos(d)
+
+    sin_p2 = sin_p1 * cos_d + cos_p1 * sin_d * np.cos(headings)
+    p2 = np.arcsin(np.clip(sin_p2, -1.0, 1.0))
+    dl = np.arctan2(np.sin(headings) * sin_d * cos_p1, cos_d - sin_p1 * sin_p2)
+    lon = (np.add(lons, np.degrees(dl)) + 540.0) % 360.0 - 180.0
+    return (np.degrees(p2), lon)
+
+
+def lossodromic_many(lats_a, lons_a, lats_b, lons_b) -> Tuple[np.ndarray, np.ndarray]:
+    """Array version of sphere_lossodromic; inputs are broadcasted together"""
+    p1 = np.radians(lats_a)
+    p2 = np.radians(lats_b)
+    dl = np.radians(np.subtract(lons_b, lons_a))
+    cos_p2 = np.cos(p2)
+    brg = np.arctan2(
+        np.sin(dl) * cos_p2,
+        np.cos(p1) * np.sin(p2) - np.sin(p1) * cos_p2 * np.cos(dl),
+    )
+    return (point_distance_many(lats_a, lons_a, lats_b, lons_b, "km"), brg)
+
+
 def max_reach_distance(p, speed: float, dt: float = (1.0 / 60.0 * 60.0)) -> float:
-    maxp = routage_point_distance(p[0], p[1], speed * dt, 1)
-    return point_distance(p[0], p[1], maxp[0], maxp[1])
+    """Returns the distance (nm) reachable from p at speed (kt) in dt hours; this is
+    the closed form of projecting the point and measuring it back, so p is unused"""
+    return abs(speed * dt)
+
+
+def max_reach_distance_many(speeds, dt: float = 1.0) -> np.ndarray:
+    """Array version of max_reach_distance"""
+    return np.abs(np.multiply(speeds, dt))
 
 
 def reduce360(alfa: float) -> float:
@@ -138,6 +309,15 @@ def reduce360(alfa: float) -> float:
     return alfa
 
 
+def reduce360_many(alfa) -> np.ndarray:
+    """Array version of reduce360"""
+    alfa = np.asarray(alfa, dtype=np.float64)
+    n = np.abs(np.trunc(alfa * 0.5 / math.pi))
+    alfa = np.where(alfa > 2.0 * math.pi, alfa - n * 2.0 * math.pi, alfa)
+    alfa = np.where(alfa < 0, (n + 1) * 2.0 * math.pi + alfa, alfa)
+    return np.where(np.isnan(alfa) | (alfa > 2.0 * math.pi) | (alfa < 0), 0.0, alfa)
+
+
 def reduce180(alfa: float) -> float:
     if alfa > math.pi:
         alfa = alfa - 2 * math.pi